@@ -3,14 +3,15 @@ from datetime import timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
+from ..database import get_async_db
 from ..models import User
 from ..schemas import UserCreate, UserOut, Token
 from ..config import settings
 from ..deps import get_current_user
-from .utils import hash_password, verify_password, create_access_token
+from .utils import hash_password_async, verify_and_update_password_async, create_access_token
 
 logger = logging.getLogger(__name__)
 
@@ -18,10 +19,10 @@ router = APIRouter()
 
 
 @router.post("/register", response_model=UserOut)
-def register(user_in: UserCreate, db: Session = Depends(get_db)):
+async def register(user_in: UserCreate, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Register endpoint called - Email: {user_in.email}")
     try:
-        existing = db.query(User).filter(User.email == user_in.email).first()
+        existing = (await db.execute(select(User).where(User.email == user_in.email))).scalars().first()
         if existing:
             logger.warning(f"Registration attempt with existing email: {user_in.email}")
             raise HTTPException(status_code=400, detail="Email already registered")
@@ -30,26 +31,26 @@ def register(user_in: UserCreate, db: Session = Depends(get_db)):
         user = User(
             name=user_in.name,
             email=user_in.email,
-            password_hash=hash_password(user_in.password),
+            password_hash=await hash_password_async(user_in.password),
             role="user",
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
         logger.info(f"✓ User registered successfully: {user.email} (ID: {user.id})")
         return user
     except Exception as e:
         logger.error(f"✗ Registration failed: {e}")
-        db.rollback()
+        await db.rollback()
         raise
 
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Login endpoint called - Username/Email: {form_data.username}")
     try:
         logger.debug(f"Querying user with email: {form_data.username}")
-        user = db.query(User).filter(User.email == form_data.username).first()
+        user = (await db.execute(select(User).where(User.email == form_data.username))).scalars().first()
         
         if not user:
             logger.warning(f"Login attempt with non-existent email: {form_data.username}")
@@ -57,7 +58,7 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect email or password")
         
         logger.debug(f"User found: {user.email} (ID: {user.id}), verifying password...")
-        password_valid = verify_password(form_data.password, user.password_hash)
+        password_valid, new_hash = await verify_and_update_password_async(form_data.password, user.password_hash)
         logger.debug(f"Password verification result: {password_valid}")
         
         if not password_valid:
@@ -65,9 +66,19 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
             logger.debug("Raising 400 Bad Request - Password mismatch")
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Incorrect email or password")
 
+        if new_hash:
+            # The bcrypt cost changed since this hash was made; upgrade it while we have the password
+            try:
+                user.password_hash = new_hash
+                await db.commit()
+                logger.info(f"✓ Rehashed password for user: {user.email} (ID: {user.id})")
+            except Exception as e:
+                logger.warning(f"⚠ Failed to rehash password for user {user.id}: {e}")
+                await db.rollback()
+
         logger.debug(f"Password verified for user: {user.email}, generating token...")
         access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-        access_token = create_access_token(data={"sub": user.id}, expires_delta=access_token_expires)
+        access_token = create_access_token(data={"sub": str(user.id)}, expires_delta=access_token_expires)
         logger.info(f"✓ Login successful for user: {user.email} (ID: {user.id})")
         return Token(access_token=access_token, token_type="bearer")
     except HTTPException:
@@ -78,6 +89,6 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 
 
 @router.get("/me", response_model=UserOut)
-def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: User = Depends(get_current_user)):
     logger.info(f"Get /me endpoint called - User ID: {current_user.id}")
     return current_user
@@ -1,20 +1,80 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional, Tuple, TypeVar
 
+from fastapi import HTTPException, status
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from ..config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Hashes made with a different cost are flagged by verify_and_update and replaced on login
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+
+
+class PasswordHasherBusy(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-in attempts right now, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+class PasswordHasher:
+    """Runs bcrypt on its own small thread pool with a bounded wait queue.
+
+    bcrypt releases the GIL, so a few dedicated threads keep all cores busy
+    without borrowing the request threadpool. Callers beyond ``workers +
+    max_pending`` are turned away immediately instead of queueing, which caps
+    how many request threads a login burst can tie up.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def submit(self, fn: Callable[..., T], *args) -> "Future[T]":
+        if not self._slots.acquire(blocking=False):
+            logger.warning("⚠ Password hashing queue full, rejecting request")
+            raise PasswordHasherBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn: Callable[..., T], *args) -> T:
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable[..., T], *args) -> T:
+        """Like ``run`` for ``async def`` callers: waits without holding a thread."""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+
+password_hasher = PasswordHasher(settings.password_hash_workers, settings.password_hash_max_pending)
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hasher.run(pwd_context.hash, password)
+
+
+async def hash_password_async(password: str) -> str:
+    return await password_hasher.run_async(pwd_context.hash, password)
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password; also return a fresh hash when the stored one uses an outdated cost."""
+    return await password_hasher.run_async(pwd_context.verify_and_update, plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -0,0 +1,243 @@
+"""Response cache for hot, rarely-changing reads.
+
+Entries are keyed on a namespace generation plus the normalized request, so
+invalidating a namespace is a single counter bump instead of a key scan.
+The generation counters always live in the SQLite file at
+``settings.cache_path``, so a write in one worker invalidates the cached
+responses of every worker on the host. Entries are stored according to
+``settings.cache_backend``:
+
+- ``memory``: per-process LRU with TTL (default).
+- ``sqlite``: the same file, shared by every worker, standing in for a
+  shared store such as Redis.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from starlette.requests import Request
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Item list and detail responses; bumped whenever an item or its images change
+ITEMS_NAMESPACE = "items"
+# Cached users in deps.get_current_user; bumped whenever a user row changes
+USERS_NAMESPACE = "users"
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def counter(self, name: str) -> int:
+        ...
+
+    @abstractmethod
+    def incr(self, name: str) -> int:
+        ...
+
+
+def _open(path: str, schema: str) -> sqlite3.Connection:
+    """Open the shared file on first use in a thread; nothing touches it at import time."""
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(schema)
+    return conn
+
+
+class SQLiteCounters:
+    """Namespace generations in a SQLite file, seen by every worker process on the host."""
+
+    SCHEMA = "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = _open(self.path, self.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, name: str) -> int:
+        row = self._connect().execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def incr(self, name: str) -> int:
+        self._connect().execute(
+            "INSERT INTO counters VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,)
+        )
+        return self.get(name)
+
+
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, max_entries: int, counters: SQLiteCounters):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._counters = counters
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def counter(self, name: str) -> int:
+        return self._counters.get(name)
+
+    def incr(self, name: str) -> int:
+        generation = self._counters.incr(name)
+        with self._lock:
+            # Entries under the old generation can no longer be hit; drop them now. Other
+            # workers' stale entries are never hit either and age out of their LRU.
+            for key in [k for k in self._entries if k.startswith(f"{name}:")]:
+                del self._entries[key]
+        return generation
+
+
+class SQLiteCacheBackend(CacheBackend):
+    SCHEMA = "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, expires REAL)"
+
+    def __init__(self, path: str, max_entries: int, counters: SQLiteCounters):
+        self.path = path
+        self.max_entries = max_entries
+        self._counters = counters
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = _open(self.path, self.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._connect().execute(
+            "SELECT value FROM entries WHERE key = ? AND expires >= ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        conn = self._connect()
+        now = time.time()
+        conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, value, now + ttl))
+        # Cheap bound on the file size; expired rows go first
+        conn.execute("DELETE FROM entries WHERE expires < ?", (now,))
+        conn.execute(
+            "DELETE FROM entries WHERE key NOT IN (SELECT key FROM entries ORDER BY expires DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+
+    def counter(self, name: str) -> int:
+        return self._counters.get(name)
+
+    def incr(self, name: str) -> int:
+        return self._counters.incr(name)
+
+
+# Query parameters holding an unordered, comma-separated list
+LIST_PARAMS = {"fields"}
+
+
+def _normalize_list(value: str) -> str:
+    return ",".join(sorted({part.strip() for part in value.split(",") if part.strip()}))
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+
+    def key(self, namespace: str, request: Request) -> str:
+        """Generation-scoped key; query parameters are sorted and blanks dropped.
+
+        Comma-separated list parameters are normalized too, so ``fields=a,b``
+        and ``fields=b,a`` share an entry.
+        """
+        params = sorted(
+            (k, _normalize_list(v) if k in LIST_PARAMS else v)
+            for k, v in request.query_params.multi_items()
+            if v != ""
+        )
+        generation = self.backend.counter(namespace)
+        return f"{namespace}:{generation}:{request.url.path}?{json.dumps(params, separators=(',', ':'))}"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        try:
+            raw = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"⚠ Response cache read failed: {e}")
+            return None
+        if raw is None:
+            return None
+        meta, _, body = raw.partition(b"\n")
+        etag, headers = json.loads(meta)
+        return CachedResponse(body, etag, headers)
+
+    def put(self, key: str, body: bytes, headers: Dict[str, str]) -> CachedResponse:
+        entry = CachedResponse(body, f'"{hashlib.sha1(body).hexdigest()}"', headers)
+        try:
+            self.backend.set(key, json.dumps([entry.etag, headers]).encode() + b"\n" + body, self.ttl)
+        except Exception as e:
+            logger.warning(f"⚠ Response cache write failed: {e}")
+        return entry
+
+    def invalidate(self, namespace: str) -> None:
+        try:
+            self.backend.incr(namespace)
+        except Exception as e:
+            logger.warning(f"⚠ Response cache invalidation failed for {namespace}: {e}")
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _make_backend(counters: SQLiteCounters) -> CacheBackend:
+    if settings.cache_backend == "sqlite":
+        return SQLiteCacheBackend(settings.cache_path, settings.cache_max_entries, counters)
+    return MemoryCacheBackend(settings.cache_max_entries, counters)
+
+
+shared_counters = SQLiteCounters(settings.cache_path)
+response_cache = ResponseCache(_make_backend(shared_counters), settings.cache_ttl_seconds)
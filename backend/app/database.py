@@ -1,5 +1,7 @@
 import logging
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from .config import settings
@@ -8,13 +10,44 @@ logger = logging.getLogger(__name__)
 
 logger.debug(f"Database URL: {settings.database_url}")
 
+# Request handlers use the async engine; background jobs and scripts keep the sync one
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Swap the sync driver in ``url`` for its asyncio counterpart."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver known for {parsed.drivername}; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def _pool_options(url: str) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        # SQLite has no server connections to budget; keep SQLAlchemy's default pool
+        return {}
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+
 engine = None
 SessionLocal = None
+async_engine = None
+AsyncSessionLocal = None
 
 try:
-    engine = create_engine(settings.database_url, pool_pre_ping=True)
+    engine = create_engine(settings.database_url, pool_pre_ping=True, **_pool_options(settings.database_url))
     logger.info("✓ SQLAlchemy engine created successfully")
-    
+
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     logger.info("✓ SessionLocal factory created successfully")
 except ImportError as e:
@@ -28,6 +61,17 @@ except Exception as e:
     engine = None
     SessionLocal = None
 
+try:
+    async_url = settings.async_database_url or async_database_url(settings.database_url)
+    async_engine = create_async_engine(async_url, pool_pre_ping=True, **_pool_options(async_url))
+    # Objects stay usable after commit; lazy loads would need a round trip the event loop cannot block on
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    logger.info("✓ Async SQLAlchemy engine created successfully")
+except ImportError as e:
+    logger.warning(f"⚠ Async database driver not available (asyncpg/aiomysql/aiosqlite): {e}")
+except Exception as e:
+    logger.warning(f"⚠ Async database engine not created: {e}")
+
 Base = declarative_base()
 logger.info("✓ Declarative base created successfully")
 
@@ -46,3 +90,18 @@ def get_db():
     finally:
         logger.debug("Closing database session...")
         db.close()
+
+
+async def get_async_db():
+    """Get an async database session for ``async def`` routes"""
+    logger.debug("Creating new async database session...")
+    db: AsyncSession = AsyncSessionLocal()
+    try:
+        yield db
+    except Exception as e:
+        logger.error(f"✗ Error in database session: {e}")
+        await db.rollback()
+        raise
+    finally:
+        logger.debug("Closing async database session...")
+        await db.close()
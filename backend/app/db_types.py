@@ -0,0 +1,56 @@
+import json
+from typing import Optional, Sequence, Union
+
+import numpy as np
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+# Feature vectors are stored as raw little-endian float32, feature_dim * 4 bytes
+VECTOR_DTYPE = np.dtype("<f4")
+
+
+def is_legacy_vector(value: Union[bytes, str]) -> bool:
+    """True for rows still holding the old JSON list encoding."""
+    if isinstance(value, str):
+        return True
+    # A JSON list is ASCII and bracketed; raw float32 bytes never decode as one
+    return value[:1] == b"[" and value[-1:] == b"]"
+
+
+def encode_vector(vector: Union[np.ndarray, Sequence[float]]) -> bytes:
+    return np.asarray(vector, dtype=VECTOR_DTYPE).tobytes()
+
+
+def decode_vector(value: Union[bytes, str], dim: Optional[int] = None) -> np.ndarray:
+    """Decode a stored vector; binary rows become a read-only view of ``value``."""
+    if is_legacy_vector(value):
+        try:
+            vec = np.asarray(json.loads(value), dtype=VECTOR_DTYPE)
+        except ValueError:
+            vec = np.frombuffer(value, dtype=VECTOR_DTYPE)
+    else:
+        vec = np.frombuffer(value, dtype=VECTOR_DTYPE)
+    if dim is not None and vec.shape != (dim,):
+        raise ValueError(f"Stored vector has {vec.size} values, expected feature_dim {dim}")
+    return vec
+
+
+class Float32Vector(TypeDecorator):
+    """Feature vector column holding raw little-endian float32 bytes.
+
+    Accepts lists or NumPy arrays on write and returns NumPy arrays on read.
+    Legacy JSON rows are still decoded until migrate_feature_vectors.py has
+    rewritten them.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return encode_vector(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decode_vector(value)
@@ -1,17 +1,154 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from .cache import USERS_NAMESPACE, SQLiteCounters, shared_counters
 from .config import settings
-from .database import get_db
+from .database import get_async_db
 from .models import User
 from .schemas import TokenData
 
+logger = logging.getLogger(__name__)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+_USER_COLUMNS = [attr.key for attr in inspect(User).column_attrs]
+
+
+class UserCache:
+    """TTL-bounded LRU of user column values keyed by user id.
+
+    Every lookup builds a fresh, session-less ``User`` so routes cannot leak
+    changes into the cache or share an instance across requests. Entries are
+    tagged with the shared ``users`` generation (see cache.py) and only hit
+    while it is unchanged; committing any change to a user row bumps it, so
+    every worker drops its entries.
+
+    Each worker rereads the generation at most every ``generation_interval``
+    seconds, so most lookups are a dict access with no I/O. Another worker's
+    change is therefore seen within that interval (this worker's own changes
+    at once); changes made outside this app's sessions still wait out the TTL.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, generation_interval: float, counters: SQLiteCounters):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation_interval = generation_interval
+        self.hits = 0
+        self.misses = 0
+        self._counters = counters
+        self._entries: "OrderedDict[int, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # (generation, monotonic time it was read); None until first read
+        self._generation: Optional[Tuple[int, float]] = None
+
+    def cached_generation(self) -> Optional[int]:
+        """The generation read within the last ``generation_interval`` seconds, without I/O; else None."""
+        cached = self._generation
+        if cached is None or time.monotonic() - cached[1] >= self.generation_interval:
+            return None
+        return cached[0]
+
+    def read_generation(self) -> Optional[int]:
+        """Read the shared generation; None if it cannot be read, which disables the cache."""
+        read_at = time.monotonic()
+        try:
+            generation = self._counters.get(USERS_NAMESPACE)
+        except Exception as e:
+            logger.warning(f"⚠ User cache generation read failed: {e}")
+            return None
+        self._generation = (generation, read_at)
+        return generation
+
+    def get(self, user_id: int, generation: Optional[int]) -> Optional[User]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or generation is None or entry[0] < time.monotonic() or entry[1] != generation:
+                self._entries.pop(user_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            values = entry[2]
+        return User(**values)
+
+    def put(self, user: User, generation: Optional[int]) -> None:
+        """Cache ``user``, read from the database while ``generation`` was current."""
+        if generation is None:
+            return
+        values = {key: getattr(user, key) for key in _USER_COLUMNS}
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, generation, values)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_all(self) -> None:
+        """Drop every worker's entries."""
+        try:
+            self._generation = (self._counters.incr(USERS_NAMESPACE), time.monotonic())
+        except Exception as e:
+            logger.warning(f"⚠ User cache invalidation failed: {e}")
+            self._generation = None
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+
+user_cache = UserCache(
+    settings.user_cache_ttl_seconds,
+    settings.user_cache_max_entries,
+    settings.user_cache_generation_seconds,
+    shared_counters,
+)
+
+# Set on a session that changed a user row; the generation is bumped once the change commits,
+# so no worker can re-cache the old row under the new generation
+_USERS_CHANGED = "users_changed"
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _record_user_change(mapper, connection, target: User) -> None:
+    session = inspect(target).session
+    if session is not None:
+        session.info[_USERS_CHANGED] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk_user_change(orm_execute_state) -> None:
+    # Bulk update()/delete() statements bypass the mapper events above
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and getattr(
+        orm_execute_state.statement, "table", None
+    ) is User.__table__:
+        orm_execute_state.session.info[_USERS_CHANGED] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_cached_users(session: Session) -> None:
+    if session.info.pop(_USERS_CHANGED, False):
+        user_cache.invalidate_all()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_changes(session: Session) -> None:
+    session.info.pop(_USERS_CHANGED, None)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -19,20 +156,31 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     )
     try:
         payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
-        user_id: int = payload.get("sub")
+        user_id: Optional[str] = payload.get("sub")
         if user_id is None:
             raise credentials_exception
         token_data = TokenData(user_id=user_id)
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == token_data.user_id).first()
+    # Read before the database: a change committed after this point bumps it past the entry.
+    # Only a stale per-worker copy costs a read, and that read goes to the threadpool
+    generation = user_cache.cached_generation()
+    if generation is None:
+        generation = await run_in_threadpool(user_cache.read_generation)
+    user = user_cache.get(token_data.user_id, generation)
+    if user is not None:
+        return user
+
+    user = await db.get(User, token_data.user_id)
     if user is None:
         raise credentials_exception
+    user_cache.put(user, generation)
+    logger.debug(f"User cache miss for user {user.id} ({user_cache.stats()})")
     return user
 
 
-def get_current_admin(user: User = Depends(get_current_user)) -> User:
+async def get_current_admin(user: User = Depends(get_current_user)) -> User:
     if user.role != "admin":
         raise HTTPException(status_code=403, detail="Admins only")
     return user
@@ -0,0 +1,94 @@
+"""Resized WebP derivatives of uploaded images.
+
+Each content-addressed original ``<sha256>.<ext>`` gets ``<sha256>_thumb.webp``
+for list pages and ``<sha256>_medium.webp`` for detail views. Their URLs are
+known as soon as the upload is hashed, so rows record them immediately; the
+files are rendered in a background task after the upload commits, and
+``regenerate`` recreates any that are missing the first time they are
+requested.
+"""
+import logging
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels; images are never upscaled
+DERIVATIVE_SIZES = {"thumb": 320, "medium": 1024}
+WEBP_QUALITY = 80
+_DERIVATIVE_NAME = re.compile(r"^([0-9a-f]{64})_(thumb|medium)\.webp$")
+
+
+def derivative_filename(content_hash: str, size: str) -> str:
+    return f"{content_hash}_{size}.webp"
+
+
+def derivative_urls(content_hash: str) -> Dict[str, str]:
+    """Column values for ``ItemImage.thumbnail_url`` and ``ItemImage.medium_url``."""
+    return {
+        "thumbnail_url": f"/static/{derivative_filename(content_hash, 'thumb')}",
+        "medium_url": f"/static/{derivative_filename(content_hash, 'medium')}",
+    }
+
+
+def _find_original(directory: Path, content_hash: str) -> Optional[Path]:
+    for path in directory.glob(f"{content_hash}.*"):
+        return path
+    return None
+
+
+def generate(directory: Path, content_hash: str) -> None:
+    """Render every missing derivative of one original; the source is decoded at most once."""
+    missing = {
+        size: directory / derivative_filename(content_hash, size)
+        for size in DERIVATIVE_SIZES
+        if not (directory / derivative_filename(content_hash, size)).exists()
+    }
+    if not missing:
+        return
+    original = _find_original(directory, content_hash)
+    if original is None:
+        logger.debug(f"No original image for {content_hash}, cannot render derivatives")
+        return
+
+    with Image.open(original) as img:
+        largest = max(DERIVATIVE_SIZES[size] for size in missing)
+        # JPEGs can decode straight at a reduced scale, skipping most of the work for big photos
+        img.draft("RGB", (largest, largest))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        for size, target in sorted(missing.items(), key=lambda s: -DERIVATIVE_SIZES[s[0]]):
+            edge = DERIVATIVE_SIZES[size]
+            img.thumbnail((edge, edge), Image.LANCZOS)
+            tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}.part")
+            img.save(tmp, "WEBP", quality=WEBP_QUALITY)
+            os.replace(tmp, target)
+    logger.debug(f"✓ Rendered {', '.join(missing)} derivatives for {original.name}")
+
+
+def generate_all(directory: Path, content_hashes: Iterable[str]) -> None:
+    """Background task run after an upload commits."""
+    for content_hash in set(content_hashes):
+        try:
+            generate(directory, content_hash)
+        except Exception as e:
+            logger.warning(f"⚠ Failed to render derivatives for {content_hash}: {e}")
+
+
+def regenerate(directory: Path, filename: str) -> bool:
+    """Recreate a requested derivative that is missing on disk; True if it now exists."""
+    match = _DERIVATIVE_NAME.match(filename)
+    if not match:
+        return False
+    try:
+        generate(directory, match.group(1))
+    except Exception as e:
+        logger.warning(f"⚠ Failed to regenerate {filename}: {e}")
+        return False
+    return (directory / filename).exists()
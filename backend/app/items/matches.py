@@ -0,0 +1,336 @@
+"""Materialized top-k found-item matches for every open lost item.
+
+``item_matches`` holds each open lost item's best ``MATCH_TOP_K`` found items,
+so ``GET /items/matches/{id}`` is an indexed lookup. The lists change only
+when items are written:
+
+- a lost item's features are stored: its list is recomputed from the feature store
+- a found item's features are stored: the item is scored against every open
+  lost item it may pair with in one multiply and merged into the lists it
+  makes the cut for
+- a found item is deleted or leaves ``open``: its rows go and the lost items
+  that listed it are recomputed, since they may have had more candidates
+- a lost item is deleted or leaves ``open``: its list is dropped
+
+Only plausible pairs are scored: both items open and, per the ``match_*``
+settings, the same category and location (where both are known) and
+reports created within ``match_window_days`` of each other. These filters
+run in SQL on ``ix_items_type_status_category_created_at``; the rule is
+symmetric, so scoring from either side gives the same lists.
+
+``Item.matches_updated_at`` is NULL while an item's list has never been
+computed (e.g. rows that predate this table); reads compute it on demand.
+"""
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import Select, event, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from ..cache import ITEMS_NAMESPACE, response_cache
+from ..config import settings
+from ..database import SessionLocal
+from ..models import ImageFeature, Item, ItemImage, ItemMatch
+from ..ml.feature_store import get_feature_store
+
+logger = logging.getLogger(__name__)
+
+MATCH_TOP_K = 5
+MATCH_MIN_SCORE = 0.05  # 5% similarity
+
+
+def load_found_features(db: Session):
+    """(item_ids, vectors) for every image of an open FOUND item, used to build the feature store."""
+    rows = (
+        db.query(Item.id, ImageFeature.feature_vec)
+        .join(ItemImage, ItemImage.item_id == Item.id)
+        .join(ImageFeature, ImageFeature.image_id == ItemImage.id)
+        .filter(Item.type == "found", Item.status == "open", ImageFeature.model_name == settings.feature_model)
+        .order_by(ImageFeature.id)
+        .all()
+    )
+    return [row[0] for row in rows], [row[1] for row in rows]
+
+
+def _item_vectors(db: Session, item_id: int) -> List[np.ndarray]:
+    return [
+        row[0]
+        for row in db.query(ImageFeature.feature_vec)
+        .join(ItemImage, ImageFeature.image_id == ItemImage.id)
+        .filter(ItemImage.item_id == item_id, ImageFeature.model_name == settings.feature_model)
+        .all()
+    ]
+
+
+def counterpart_filters(item: Item) -> list:
+    """SQL conditions on ``Item`` selecting the open items of the other type that ``item`` may pair with."""
+    conditions = [Item.type == ("found" if item.type == "lost" else "lost"), Item.status == "open"]
+    if settings.match_same_category and item.category:
+        conditions.append(or_(Item.category == item.category, Item.category.is_(None)))
+    if settings.match_same_location and item.location:
+        conditions.append(or_(Item.location == item.location, Item.location.is_(None)))
+    if settings.match_window_days > 0 and item.created_at is not None:
+        window = timedelta(days=settings.match_window_days)
+        conditions.append(Item.created_at.between(item.created_at - window, item.created_at + window))
+    return conditions
+
+
+def _lock_items(db: Session, item_ids: Sequence[int]) -> None:
+    """Serialize concurrent writers of the same lists; a no-op where row locks are unsupported."""
+    db.query(Item.id).filter(Item.id.in_(item_ids)).with_for_update().all()
+
+
+def search_lost_item(db: Session, lost_item_id: int) -> Optional[List[Tuple[int, float]]]:
+    """Score a lost item against the feature store without storing anything; None if it has no features yet."""
+    vectors = _item_vectors(db, lost_item_id)
+    if not vectors:
+        return None
+    lost_item = db.get(Item, lost_item_id)
+    candidates = [row[0] for row in db.query(Item.id).filter(*counterpart_filters(lost_item)).all()]
+    if not candidates:
+        return []
+    logger.debug(f"Lost item {lost_item_id} has {len(candidates)} candidate found items")
+    store = get_feature_store()
+    store.ensure(lambda: load_found_features(db))
+    return store.search(
+        np.stack(vectors), MATCH_TOP_K, MATCH_MIN_SCORE, reduce=settings.match_reduce, candidates=candidates
+    )
+
+
+def refresh_lost_item(db: Session, lost_item_id: int) -> Optional[List[Tuple[int, float]]]:
+    """Recompute and store one lost item's list; None if it has no features yet."""
+    # Lock before searching: a found item merged in by add_found_item meanwhile would be overwritten
+    _lock_items(db, [lost_item_id])
+    results = search_lost_item(db, lost_item_id)
+    if results is None:
+        db.rollback()
+        return None
+
+    existing = {
+        row.found_item_id: row for row in db.query(ItemMatch).filter(ItemMatch.lost_item_id == lost_item_id).all()
+    }
+    now = datetime.utcnow()
+    for found_item_id, score in results:
+        row = existing.pop(found_item_id, None)
+        if row is None:
+            db.add(ItemMatch(lost_item_id=lost_item_id, found_item_id=found_item_id, score=score, created_at=now))
+        else:
+            row.score = score
+    for row in existing.values():
+        db.delete(row)
+    db.query(Item).filter(Item.id == lost_item_id).update({"matches_updated_at": now}, synchronize_session=False)
+    db.commit()
+    logger.debug(f"Recomputed {len(results)} matches for lost item {lost_item_id}")
+    return results
+
+
+def add_found_item(db: Session, found_item_id: int, vectors: Sequence[Sequence[float]]) -> None:
+    """Score a found item against every open lost item it may pair with and merge it into their lists."""
+    found_item = db.get(Item, found_item_id)
+    if not vectors or found_item is None:
+        return
+    rows = (
+        db.query(ItemImage.item_id, ImageFeature.feature_vec)
+        .join(ImageFeature, ImageFeature.image_id == ItemImage.id)
+        .join(Item, Item.id == ItemImage.item_id)
+        .filter(
+            *counterpart_filters(found_item),
+            Item.matches_updated_at.isnot(None),
+            ImageFeature.model_name == settings.feature_model,
+        )
+        .order_by(ItemImage.item_id)
+        .all()
+    )
+    if not rows:
+        return
+
+    lost_ids = np.array([row[0] for row in rows])
+    # (lost images x found images); each lost image keeps its best found image
+    per_image = (np.stack([row[1] for row in rows]) @ np.asarray(vectors, dtype="<f4").T).max(axis=1)
+    starts = np.flatnonzero(np.r_[True, lost_ids[1:] != lost_ids[:-1]])
+    if settings.match_reduce == "mean":
+        scores = np.add.reduceat(per_image, starts) / np.diff(np.r_[starts, lost_ids.size])
+    else:
+        scores = np.maximum.reduceat(per_image, starts)
+    passing = np.flatnonzero(scores > MATCH_MIN_SCORE)
+    if passing.size == 0:
+        return
+    candidates: Dict[int, float] = {int(lost_ids[starts[i]]): float(scores[i]) for i in passing}
+
+    _lock_items(db, list(candidates))
+    current: Dict[int, List[ItemMatch]] = defaultdict(list)
+    for row in db.query(ItemMatch).filter(ItemMatch.lost_item_id.in_(list(candidates))).all():
+        current[row.lost_item_id].append(row)
+
+    now = datetime.utcnow()
+    added = 0
+    for lost_item_id, score in candidates.items():
+        existing = next((row for row in current[lost_item_id] if row.found_item_id == found_item_id), None)
+        ranked = [(row.score, row.found_item_id, row) for row in current[lost_item_id] if row is not existing]
+        ranked.append((score, found_item_id, existing))
+        # Same order as FeatureStore.search: best score first, ties by lower item id
+        ranked.sort(key=lambda entry: (-entry[0], entry[1]))
+        for _, _, row in ranked[MATCH_TOP_K:]:
+            if row is not None:
+                db.delete(row)
+        if any(entry[1] == found_item_id for entry in ranked[:MATCH_TOP_K]):
+            if existing is not None:
+                existing.score = score
+            else:
+                db.add(ItemMatch(lost_item_id=lost_item_id, found_item_id=found_item_id, score=score, created_at=now))
+                added += 1
+                logger.info(f"✓ New match for lost item {lost_item_id}: found item {found_item_id} ({score:.3f})")
+    db.commit()
+    logger.debug(f"Found item {found_item_id} entered {added} of {len(candidates)} candidate match lists")
+
+
+def remove_item(db: Session, item: Item) -> List[int]:
+    """Delete every match row of ``item`` in the caller's transaction.
+
+    Returns the lost items that listed a removed found item; pass them to
+    ``refresh_lost_items`` once the caller has committed.
+    """
+    affected: List[int] = []
+    if item.type == "found":
+        affected = [
+            row[0] for row in db.query(ItemMatch.lost_item_id).filter(ItemMatch.found_item_id == item.id).all()
+        ]
+    db.query(ItemMatch).filter(
+        or_(ItemMatch.lost_item_id == item.id, ItemMatch.found_item_id == item.id)
+    ).delete(synchronize_session=False)
+    return affected
+
+
+def refresh_lost_items(lost_item_ids: Sequence[int]) -> None:
+    if not lost_item_ids:
+        return
+    db = SessionLocal()
+    try:
+        for lost_item_id in lost_item_ids:
+            try:
+                refresh_lost_item(db, lost_item_id)
+            except Exception as e:
+                logger.warning(f"⚠ Failed to recompute matches for lost item {lost_item_id}: {e}")
+                db.rollback()
+    finally:
+        db.close()
+
+
+def features_stored(found_item_ids: Set[int], lost_item_ids: Set[int]) -> None:
+    """Update match lists after the feature jobs stored vectors for these items."""
+    db = SessionLocal()
+    try:
+        for found_item_id in sorted(found_item_ids):
+            try:
+                # All of the item's images, not just this batch's: they may have arrived separately
+                add_found_item(db, found_item_id, _item_vectors(db, found_item_id))
+            except Exception as e:
+                logger.warning(f"⚠ Failed to merge found item {found_item_id} into match lists: {e}")
+                db.rollback()
+    finally:
+        db.close()
+    refresh_lost_items(sorted(lost_item_ids))
+
+
+def stored_matches(lost_item_id: int) -> Select:
+    """The stored list as (found_item_id, score) rows, best first; runs on either kind of session."""
+    return (
+        select(ItemMatch.found_item_id, ItemMatch.score)
+        .where(ItemMatch.lost_item_id == lost_item_id)
+        .order_by(ItemMatch.score.desc(), ItemMatch.found_item_id)
+        .limit(MATCH_TOP_K)
+    )
+
+
+def compute_matches(lost_item_id: int, persist: bool) -> Optional[List[Tuple[int, float]]]:
+    """Score a lost item in a session of its own, storing the list if ``persist``; for worker threads."""
+    db = SessionLocal()
+    try:
+        return refresh_lost_item(db, lost_item_id) if persist else search_lost_item(db, lost_item_id)
+    finally:
+        db.close()
+
+
+def rebuild_all(db: Session) -> int:
+    """Rebuild the feature store from the active model's vectors and drop every list; returns rows dropped."""
+    get_feature_store().rebuild(*load_found_features(db))
+    return reset_all(db)
+
+
+def reset_all(db: Session) -> int:
+    """Drop every list so each is recomputed on its next read, e.g. after switching feature models."""
+    deleted = db.query(ItemMatch).delete(synchronize_session=False)
+    db.query(Item).filter(Item.matches_updated_at.isnot(None)).update(
+        {"matches_updated_at": None}, synchronize_session=False
+    )
+    db.commit()
+    return deleted
+
+
+# Status changes can come from any session; collect them at flush and apply after commit
+_STATUS_CHANGES = "match_status_changes"
+
+
+@event.listens_for(Item, "after_update")
+def _record_status_change(mapper, connection, target: Item) -> None:
+    history = inspect(target).attrs.status.history
+    if history.has_changes():
+        session = inspect(target).session
+        if session is not None:
+            session.info.setdefault(_STATUS_CHANGES, {})[target.id] = (target.type, target.status)
+
+
+# One thread applies status changes in commit order; the hook can fire inside an
+# AsyncSession commit, where blocking database and feature store work would stall the event loop
+_status_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="match-status")
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_status_changes(session: Session) -> None:
+    changes: Optional[Dict[int, Tuple[str, Optional[str]]]] = session.info.pop(_STATUS_CHANGES, None)
+    if changes:
+        _status_executor.submit(_status_changed, changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_status_changes(session: Session) -> None:
+    session.info.pop(_STATUS_CHANGES, None)
+
+
+def _status_changed(changes: Dict[int, Tuple[str, Optional[str]]]) -> None:
+    store = get_feature_store()
+    db = SessionLocal()
+    affected: List[int] = []
+    try:
+        for item_id, (item_type, status) in changes.items():
+            item = db.get(Item, item_id)
+            if item is None:
+                continue
+            if item_type == "lost":
+                if status == "open":
+                    affected.append(item_id)
+                else:
+                    remove_item(db, item)
+                    item.matches_updated_at = None
+                    db.commit()
+            elif status == "open":
+                vectors = _item_vectors(db, item_id)
+                if vectors:
+                    store.add(item_id, vectors)
+                    add_found_item(db, item_id, vectors)
+            else:
+                store.remove(item_id)
+                affected.extend(remove_item(db, item))
+                db.commit()
+    except Exception as e:
+        logger.warning(f"⚠ Failed to update match lists after status change: {e}")
+        db.rollback()
+    finally:
+        db.close()
+    refresh_lost_items(affected)
+    # Item responses embed the status
+    response_cache.invalidate(ITEMS_NAMESPACE)
@@ -1,39 +1,137 @@
+import base64
+import json
 import logging
-from typing import List, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-import json
 from pathlib import Path
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-
-from ..database import get_db
-from ..models import Item, ItemImage, ImageFeature, User
-from ..schemas import ItemDetail, ItemOut, MatchResult
-from ..ml.client import extract_features, compare_features
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, UploadFile, File, Form
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, selectinload
+from starlette.concurrency import run_in_threadpool
+
+from ..cache import ITEMS_NAMESPACE, CachedResponse, etag_matches, response_cache
+from ..config import settings
+from ..database import get_async_db
+from ..models import Item, ItemImage, User
+from ..schemas import ImageFeatureStatus, ItemDetail, ItemFeatureStatus, ItemImageOut, ItemOut, MatchResult
+from ..ml.feature_store import get_feature_store
+from ..ml.jobs import feature_jobs
+from . import derivatives, matches, search
+from .storage import store_upload
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-STATIC_DIR = Path("static")
-STATIC_DIR.mkdir(exist_ok=True)
-logger.info(f"Static directory configured at: {STATIC_DIR.absolute()}")
+STATIC_DIR = Path(settings.static_dir)  # created by the app's lifespan handler
+
+
+ITEM_PAGE_SIZE = 50
+ITEM_PAGE_SIZE_MAX = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+ITEM_FIELDS = set(ItemDetail.__fields__)
+
+
+def _encode_cursor(item: Item) -> str:
+    raw = f"{item.created_at.isoformat()}|{item.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, item_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(item_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = set(requested) - ITEM_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return requested
+
+
+async def _cached_json(request: Request, build) -> Response:
+    """Serve ``build()`` through the item response cache with ETag revalidation.
+
+    ``build`` is a coroutine function returning (content, headers); it only runs on a cache miss.
+    """
+    # The cache backends do blocking SQLite and lock work, so they run on the threadpool
+    key = await run_in_threadpool(response_cache.key, ITEMS_NAMESPACE, request)
+    entry: Optional[CachedResponse] = await run_in_threadpool(response_cache.get, key)
+    if entry is None:
+        content, headers = await build()
+        body = json.dumps(
+            jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+        entry = await run_in_threadpool(response_cache.put, key, body, headers)
+    else:
+        logger.debug(f"Response cache hit: {key}")
+
+    headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def _project_item(item: Item, fields: List[str]) -> dict:
+    data = {}
+    for field in fields:
+        if field == "images":
+            data["images"] = [ItemImageOut.from_orm(image).dict() for image in item.images]
+        else:
+            data[field] = getattr(item, field)
+    return data
+
+
+async def _save_images(db: AsyncSession, item: Item, images: List[UploadFile]) -> List[str]:
+    """Save uploads to disk and queue feature extraction; returns the content hashes."""
+    image_rows: List[ItemImage] = []
+    for img in images:
+        logger.debug(f"Processing image: {img.filename}")
+        stored = await store_upload(img, STATIC_DIR)
+        logger.debug(f"✓ Image saved to: {STATIC_DIR / stored.filename} ({stored.size} bytes)")
+
+        image_row = ItemImage(
+            item_id=item.id,
+            image_url=f"/static/{stored.filename}",
+            content_hash=stored.content_hash,
+            **derivatives.derivative_urls(stored.content_hash),
+        )
+        db.add(image_row)
+        image_rows.append(image_row)
+
+    if not image_rows:
+        return []
+    await db.flush()  # get image_row.id
+    feature_jobs.enqueue(db, image_rows)
+    logger.debug(f"✓ Queued feature extraction for {len(image_rows)} images of item: {item.id}")
+    return [image_row.content_hash for image_row in image_rows]
 
 
 @router.post("/lost", response_model=ItemOut)
 async def create_lost_item(
+    background_tasks: BackgroundTasks,
     title: str = Form(...),
     description: Optional[str] = Form(None),
     category: Optional[str] = Form(None),
     location: Optional[str] = Form(None),
     date_reported: Optional[str] = Form(None),  # ISO date string
     images: List[UploadFile] = File([]),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     logger.info(f"POST /lost endpoint called - Title: {title}, Images: {len(images)}")
     try:
-        owner: Optional[User] = db.query(User).order_by(User.id.asc()).first()
+        owner: Optional[User] = (await db.execute(select(User).order_by(User.id.asc()).limit(1))).scalars().first()
         if not owner:
             logger.error("No users available to own this item")
             raise HTTPException(status_code=400, detail="No users available to own this item")
@@ -48,61 +146,41 @@ async def create_lost_item(
             location=location,
         )
         db.add(item)
-        db.commit()
-        db.refresh(item)
+        # Flush for the id only: the item commits with its images, so a rejected upload leaves no item behind
+        await db.flush()
         logger.info(f"✓ Lost item created with ID: {item.id}")
 
-        # Save images to disk and call ML service
-        for img in images:
-            logger.debug(f"Processing image: {img.filename}")
-            contents = await img.read()
-            filename = f"item_{item.id}_{img.filename}"
-            path = STATIC_DIR / filename
-            path.write_bytes(contents)
-            logger.debug(f"✓ Image saved to: {path}")
-
-            image_row = ItemImage(item_id=item.id, image_url=f"/static/{filename}")
-            db.add(image_row)
-            db.flush()  # get image_row.id
-
-            try:
-                logger.debug(f"Extracting features from image: {filename}")
-                vec = extract_features(contents)
-                feature_row = ImageFeature(
-                    image_id=image_row.id,
-                    model_name="yolov11n",
-                    feature_dim=len(vec),
-                    feature_vec=json.dumps(vec),
-                )
-                db.add(feature_row)
-                logger.debug(f"✓ Features extracted and stored for image: {filename}")
-            except Exception as e:
-                logger.warning(f"⚠ ML service failed for image {filename}: {e}")
-                pass
+        # Save images to disk; features and thumbnails are produced in the background
+        content_hashes = await _save_images(db, item, images)
 
-        db.commit()
-        db.refresh(item)
+        await db.commit()
+        await db.refresh(item)
+        feature_jobs.notify()
+        background_tasks.add_task(derivatives.generate_all, STATIC_DIR, content_hashes)
+        await run_in_threadpool(search.index_item, item)
+        await run_in_threadpool(response_cache.invalidate, ITEMS_NAMESPACE)
         logger.info(f"✓ Lost item fully created with images: {item.id}")
         return item
     except Exception as e:
         logger.error(f"✗ Failed to create lost item: {e}")
-        db.rollback()
+        await db.rollback()
         raise
 
 
 @router.post("/found", response_model=ItemOut)
 async def create_found_item(
+    background_tasks: BackgroundTasks,
     title: str = Form(...),
     description: Optional[str] = Form(None),
     category: Optional[str] = Form(None),
     location: Optional[str] = Form(None),
     date_reported: Optional[str] = Form(None),
     images: List[UploadFile] = File([]),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     logger.info(f"POST /found endpoint called - Title: {title}, Images: {len(images)}")
     try:
-        owner: Optional[User] = db.query(User).order_by(User.id.asc()).first()
+        owner: Optional[User] = (await db.execute(select(User).order_by(User.id.asc()).limit(1))).scalars().first()
         if not owner:
             logger.error("No users available to own this item")
             raise HTTPException(status_code=400, detail="No users available to own this item")
@@ -117,399 +195,221 @@ async def create_found_item(
             location=location,
         )
         db.add(item)
-        db.commit()
-        db.refresh(item)
+        # Flush for the id only: the item commits with its images, so a rejected upload leaves no item behind
+        await db.flush()
         logger.info(f"✓ Found item created with ID: {item.id}")
 
-        for img in images:
-            logger.debug(f"Processing image: {img.filename}")
-            contents = await img.read()
-            filename = f"item_{item.id}_{img.filename}"
-            path = STATIC_DIR / filename
-            path.write_bytes(contents)
-            logger.debug(f"✓ Image saved to: {path}")
+        content_hashes = await _save_images(db, item, images)
 
-            image_row = ItemImage(item_id=item.id, image_url=f"/static/{filename}")
-            db.add(image_row)
-            db.flush()
-
-            try:
-                logger.debug(f"Extracting features from image: {filename}")
-                vec = extract_features(contents)
-                feature_row = ImageFeature(
-                    image_id=image_row.id,
-                    model_name="yolov11n",
-                    feature_dim=len(vec),
-                    feature_vec=json.dumps(vec),
-                )
-                db.add(feature_row)
-                logger.debug(f"✓ Features extracted and stored for image: {filename}")
-            except Exception as e:
-                logger.warning(f"⚠ ML service failed for image {filename}: {e}")
-                pass
-
-        db.commit()
-        db.refresh(item)
+        await db.commit()
+        await db.refresh(item)
+        feature_jobs.notify()
+        background_tasks.add_task(derivatives.generate_all, STATIC_DIR, content_hashes)
+        await run_in_threadpool(search.index_item, item)
+        await run_in_threadpool(response_cache.invalidate, ITEMS_NAMESPACE)
         logger.info(f"✓ Found item fully created with images: {item.id}")
         return item
     except Exception as e:
         logger.error(f"✗ Failed to create found item: {e}")
-        db.rollback()
+        await db.rollback()
         raise
 
 
 @router.get("/", response_model=List[ItemDetail])
-def list_items(
+async def list_items(
+    request: Request,
     type: Optional[str] = None,
     name: Optional[str] = None,
     location: Optional[str] = None,
-    db: Session = Depends(get_db),
+    limit: int = Query(ITEM_PAGE_SIZE, ge=1, le=ITEM_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated ItemDetail fields to return"),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    logger.info(f"GET /items endpoint called - Type: {type}, Name: {name}, Location: {location}")
-    try:
-        q = db.query(Item)
+    """List items newest first, one keyset page at a time.
+
+    Pass the ``X-Next-Cursor`` response header back as ``cursor`` to fetch
+    the next page; the header is absent on the last page. With ``name`` the
+    items are instead ranked by full-text relevance over title, description
+    and category, and only the best ``limit`` matches are returned.
+    """
+    logger.info(f"GET /items endpoint called - Type: {type}, Name: {name}, Location: {location}, Cursor: {cursor}")
+
+    async def build() -> Tuple[List[Any], Dict[str, str]]:
+        projection = _parse_fields(fields)
+
+        q = select(Item)
         if type:
             q = q.filter(Item.type == type)
-        if name:
-            # simple case-insensitive title contains search
-            q = q.filter(Item.title.ilike(f"%{name}%"))
         if location:
             q = q.filter(Item.location == location)
-        
-        results = q.order_by(Item.created_at.desc()).all()
+        if cursor and not name:
+            cursor_created_at, cursor_id = _decode_cursor(cursor)
+            q = q.filter(
+                or_(
+                    Item.created_at < cursor_created_at,
+                    and_(Item.created_at == cursor_created_at, Item.id < cursor_id),
+                )
+            )
+
+        if projection is None:
+            q = q.options(selectinload(Item.images))
+        else:
+            columns = {"id", "created_at"} | (set(projection) - {"images"})
+            q = q.options(load_only(*[getattr(Item, c) for c in columns]))
+            if "images" in projection:
+                q = q.options(selectinload(Item.images))
+
+        if name:
+            # Ranked full-text search returns a single page of the best matches
+            results = await db.run_sync(search.search_items, q, name, limit)
+            headers = {}
+        else:
+            # Fetch one extra row to learn whether another page exists
+            rows = (await db.execute(q.order_by(Item.created_at.desc(), Item.id.desc()).limit(limit + 1))).scalars().all()
+            results = rows[:limit]
+            headers = {NEXT_CURSOR_HEADER: _encode_cursor(results[-1])} if len(rows) > limit else {}
         logger.info(f"✓ Retrieved {len(results)} items")
-        return results
+
+        if projection is not None:
+            return [_project_item(item, projection) for item in results], headers
+        return [ItemDetail.from_orm(item) for item in results], headers
+
+    try:
+        return await _cached_json(request, build)
     except Exception as e:
         logger.error(f"✗ Failed to list items: {e}")
         raise
 
 
 @router.get("/{item_id}", response_model=ItemDetail)
-def get_item(item_id: int, db: Session = Depends(get_db)):
+async def get_item(item_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"GET /items/{item_id} endpoint called")
-    try:
-        item = db.query(Item).filter(Item.id == item_id).first()
+
+    async def build() -> Tuple[ItemDetail, Dict[str, str]]:
+        item = (
+            await db.execute(select(Item).options(selectinload(Item.images)).where(Item.id == item_id))
+        ).scalars().first()
         if not item:
             logger.warning(f"Item not found: {item_id}")
             raise HTTPException(status_code=404, detail="Item not found")
         logger.info(f"✓ Retrieved item: {item_id}")
-        return item
+        return ItemDetail.from_orm(item), {}
+
+    try:
+        return await _cached_json(request, build)
     except Exception as e:
         logger.error(f"✗ Failed to get item {item_id}: {e}")
         raise
 
 
+@router.get("/{item_id}/features", response_model=ItemFeatureStatus)
+async def get_item_feature_status(item_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Poll background feature extraction for an item's images."""
+    logger.info(f"GET /items/{item_id}/features endpoint called")
+    try:
+        if (await db.execute(select(Item.id).where(Item.id == item_id))).first() is None:
+            logger.warning(f"Item not found: {item_id}")
+            raise HTTPException(status_code=404, detail="Item not found")
+
+        rows = (
+            await db.execute(
+                select(ItemImage.id, ItemImage.feature_status)
+                .where(ItemImage.item_id == item_id)
+                .order_by(ItemImage.id)
+            )
+        ).all()
+        statuses = {feature_status for _, feature_status in rows}
+        if "pending" in statuses:
+            status = "pending"
+        elif "failed" in statuses:
+            status = "failed"
+        else:
+            status = "done"
+        return ItemFeatureStatus(
+            item_id=item_id,
+            status=status,
+            images=[ImageFeatureStatus(image_id=image_id, feature_status=fs) for image_id, fs in rows],
+        )
+    except Exception as e:
+        logger.error(f"✗ Failed to get feature status for item {item_id}: {e}")
+        raise
+
+
 @router.get("/matches/{lost_item_id}", response_model=List[MatchResult])
-def get_matches_for_lost_item(lost_item_id: int, db: Session = Depends(get_db)):
-    """Find matching FOUND items for a given LOST item using stored features."""
+async def get_matches_for_lost_item(lost_item_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Best FOUND items for a LOST item, read from the materialized item_matches table."""
     logger.info(f"GET /matches/{lost_item_id} endpoint called")
     try:
-        lost_item = db.query(Item).filter(Item.id == lost_item_id, Item.type == "lost").first()
+        lost_item = (
+            await db.execute(select(Item).where(Item.id == lost_item_id, Item.type == "lost"))
+        ).scalars().first()
         if not lost_item:
             logger.warning(f"Lost item not found: {lost_item_id}")
             raise HTTPException(status_code=404, detail="Lost item not found")
 
-        # Get one feature vector for the lost item
-        logger.debug(f"Retrieving features for lost item: {lost_item_id}")
-        lost_feature = (
-            db.query(ImageFeature)
-            .join(ItemImage, ImageFeature.image_id == ItemImage.id)
-            .filter(ItemImage.item_id == lost_item_id)
-            .first()
-        )
-        if not lost_feature:
-            logger.warning(f"No features available for lost item: {lost_item_id}")
-            raise HTTPException(status_code=400, detail="No features available for this lost item")
-
-        query_vector = json.loads(lost_feature.feature_vec)
-        logger.debug(f"Query vector loaded with {len(query_vector)} dimensions")
-
-        # Gather candidate features for all FOUND items
-        logger.debug("Retrieving candidate features from found items...")
-        candidate_rows = (
-            db.query(Item.id.label("item_id"), ImageFeature.feature_vec)
-            .join(ItemImage, ImageFeature.image_id == ItemImage.id)
-            .join(Item, ItemImage.item_id == Item.id)
-            .filter(Item.type == "found")
-            .all()
-        )
-
-        if not candidate_rows:
-            logger.info("No found items available for matching")
-            return []
-
-        candidate_vectors: List[List[float]] = []
-        candidate_ids: List[int] = []
-
-        for row in candidate_rows:
-            candidate_ids.append(row.item_id)
-            candidate_vectors.append(json.loads(row.feature_vec))
-
-        logger.info(f"Comparing with {len(candidate_vectors)} candidate items...")
-        try:
-            results = compare_features(query_vector, candidate_vectors, candidate_ids)
-            logger.debug(f"ML service returned {len(results)} results")
-            logger.debug(f"Raw ML results: {results}")
-        except Exception as exc:
-            logger.error(f"✗ ML service error: {exc}")
-            raise HTTPException(status_code=502, detail=f"ML service error: {exc}")
-
-        # results is a list of objects with a score and some id field. Try common keys.
-        def _get_result_id(r: dict) -> int:
-            if "id" in r:
-                return r["id"]
-            if "item_id" in r:
-                return r["item_id"]
-            if "index" in r:
-                # fall back to treating index as candidate index
-                idx = r["index"]
-                if 0 <= idx < len(candidate_ids):
-                    return candidate_ids[idx]
-            raise KeyError("No suitable id field in ML result")
-
-        # Sort by score descending
-        sorted_results = sorted(results, key=lambda r: r["score"], reverse=True)
-
-        # Keep matches with score > 0.05 (5% similarity)
-        filtered = [r for r in sorted_results if r["score"] > 0.05][:5]
-        logger.info(f"✓ Found {len(filtered)} matching items (scores: {[r['score'] for r in filtered]})")
-        return [MatchResult(item_id=_get_result_id(r), score=r["score"]) for r in filtered]
+        if lost_item.status == "open" and lost_item.matches_updated_at is not None:
+            results = [tuple(row) for row in (await db.execute(matches.stored_matches(lost_item_id))).all()]
+        else:
+            # Never computed (or no longer maintained): every image of the lost item takes part.
+            # Scoring is CPU work, so it runs on a worker thread rather than the event loop
+            logger.debug(f"Computing matches for lost item: {lost_item_id}")
+            results = await run_in_threadpool(matches.compute_matches, lost_item_id, lost_item.status == "open")
+            if results is None:
+                pending = (
+                    await db.execute(
+                        select(ItemImage.id).where(
+                            ItemImage.item_id == lost_item_id, ItemImage.feature_status == "pending"
+                        )
+                    )
+                ).first()
+                if pending:
+                    logger.info(f"Features still being extracted for lost item: {lost_item_id}")
+                    raise HTTPException(status_code=409, detail="Image features are still being extracted")
+                logger.warning(f"No features available for lost item: {lost_item_id}")
+                raise HTTPException(status_code=400, detail="No features available for this lost item")
+
+        logger.info(f"✓ Found {len(results)} matching items (scores: {[score for _, score in results]})")
+        return [MatchResult(item_id=item_id, score=score) for item_id, score in results]
     except Exception as e:
         logger.error(f"✗ Failed to get matches for item {lost_item_id}: {e}")
         raise
 
 
 @router.delete("/{item_id}", status_code=204)
-def delete_item(item_id: int, db: Session = Depends(get_db)):
+async def delete_item(item_id: int, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"DELETE /items/{item_id} endpoint called")
     try:
-        item = db.query(Item).filter(Item.id == item_id).first()
+        item = await db.get(Item, item_id)
         if not item:
             logger.warning(f"Item not found for deletion: {item_id}")
             raise HTTPException(status_code=404, detail="Item not found")
 
         logger.debug(f"Deleting item images for item: {item_id}")
         # Delete associated images explicitly to avoid integrity errors
-        db.query(ItemImage).filter(ItemImage.item_id == item_id).delete(synchronize_session=False)
+        await db.execute(delete(ItemImage).where(ItemImage.item_id == item_id))
 
-        db.delete(item)
-        db.commit()
+        affected_lost_items = await db.run_sync(matches.remove_item, item)
+
+        item_type = item.type
+        # A Core delete: the ORM would lazy-load item.images first, which an AsyncSession cannot do
+        await db.execute(delete(Item).where(Item.id == item_id))
+        await db.commit()
         logger.info(f"✓ Item deleted: {item_id}")
+        await run_in_threadpool(search.remove_item, item_id)
+        await run_in_threadpool(response_cache.invalidate, ITEMS_NAMESPACE)
+
+        if item_type == "found":
+            try:
+                # Takes the store's file lock and may compact the matrix; keep it off the event loop
+                await run_in_threadpool(lambda: get_feature_store().remove(item_id))
+            except Exception as e:
+                logger.warning(f"⚠ Failed to remove found item {item_id} from feature store: {e}")
+            # These lists lost an entry; a found item further down may take its place
+            await run_in_threadpool(matches.refresh_lost_items, affected_lost_items)
         return None
     except Exception as e:
         logger.error(f"✗ Failed to delete item {item_id}: {e}")
-        db.rollback()
+        await db.rollback()
         raise
 
-
-@router.post("/lost", response_model=ItemOut)
-async def create_lost_item(
-    title: str = Form(...),
-    description: Optional[str] = Form(None),
-    category: Optional[str] = Form(None),
-    location: Optional[str] = Form(None),
-    date_reported: Optional[str] = Form(None),  # ISO date string
-    images: List[UploadFile] = File([]),
-    db: Session = Depends(get_db),
-):
-    owner: Optional[User] = db.query(User).order_by(User.id.asc()).first()
-    if not owner:
-        raise HTTPException(status_code=400, detail="No users available to own this item")
-
-    item = Item(
-        user_id=owner.id,
-        type="lost",
-        title=title,
-        description=description,
-        category=category,
-        location=location,
-    )
-    db.add(item)
-    db.commit()
-    db.refresh(item)
-
-    # Save images to disk and call ML service
-    for img in images:
-        contents = await img.read()
-        filename = f"item_{item.id}_{img.filename}"
-        path = STATIC_DIR / filename
-        path.write_bytes(contents)
-
-        image_row = ItemImage(item_id=item.id, image_url=f"/static/{filename}")
-        db.add(image_row)
-        db.flush()  # get image_row.id
-
-        try:
-            vec = extract_features(contents)
-            feature_row = ImageFeature(
-                image_id=image_row.id,
-                model_name="yolov11n",
-                feature_dim=len(vec),
-                feature_vec=json.dumps(vec),
-            )
-            db.add(feature_row)
-        except Exception:
-            # If ML service fails, we still keep the item and image
-            pass
-
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@router.post("/found", response_model=ItemOut)
-async def create_found_item(
-    title: str = Form(...),
-    description: Optional[str] = Form(None),
-    category: Optional[str] = Form(None),
-    location: Optional[str] = Form(None),
-    date_reported: Optional[str] = Form(None),
-    images: List[UploadFile] = File([]),
-    db: Session = Depends(get_db),
-):
-    owner: Optional[User] = db.query(User).order_by(User.id.asc()).first()
-    if not owner:
-        raise HTTPException(status_code=400, detail="No users available to own this item")
-
-    item = Item(
-        user_id=owner.id,
-        type="found",
-        title=title,
-        description=description,
-        category=category,
-        location=location,
-    )
-    db.add(item)
-    db.commit()
-    db.refresh(item)
-
-    for img in images:
-        contents = await img.read()
-        filename = f"item_{item.id}_{img.filename}"
-        path = STATIC_DIR / filename
-        path.write_bytes(contents)
-
-        image_row = ItemImage(item_id=item.id, image_url=f"/static/{filename}")
-        db.add(image_row)
-        db.flush()
-
-        try:
-            vec = extract_features(contents)
-            feature_row = ImageFeature(
-                image_id=image_row.id,
-                model_name="yolov11n",
-                feature_dim=len(vec),
-                feature_vec=json.dumps(vec),
-            )
-            db.add(feature_row)
-        except Exception:
-            pass
-
-    db.commit()
-    db.refresh(item)
-    return item
-
-
-@router.get("/", response_model=List[ItemDetail])
-def list_items(
-    type: Optional[str] = None,
-    name: Optional[str] = None,
-    location: Optional[str] = None,
-    db: Session = Depends(get_db),
-):
-    q = db.query(Item)
-    if type:
-        q = q.filter(Item.type == type)
-    if name:
-        # simple case-insensitive title contains search
-        q = q.filter(Item.title.ilike(f"%{name}%"))
-    if location:
-        q = q.filter(Item.location == location)
-    return q.order_by(Item.created_at.desc()).all()
-
-
-@router.get("/{item_id}", response_model=ItemDetail)
-def get_item(item_id: int, db: Session = Depends(get_db)):
-    item = db.query(Item).filter(Item.id == item_id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    return item
-
-
-@router.get("/matches/{lost_item_id}", response_model=List[MatchResult])
-def get_matches_for_lost_item(lost_item_id: int, db: Session = Depends(get_db)):
-    """Find matching FOUND items for a given LOST item using stored features."""
-
-    lost_item = db.query(Item).filter(Item.id == lost_item_id, Item.type == "lost").first()
-    if not lost_item:
-        raise HTTPException(status_code=404, detail="Lost item not found")
-
-    # Get one feature vector for the lost item
-    lost_feature = (
-        db.query(ImageFeature)
-        .join(ItemImage, ImageFeature.image_id == ItemImage.id)
-        .filter(ItemImage.item_id == lost_item_id)
-        .first()
-    )
-    if not lost_feature:
-        raise HTTPException(status_code=400, detail="No features available for this lost item")
-
-    query_vector = json.loads(lost_feature.feature_vec)
-
-    # Gather candidate features for all FOUND items
-    candidate_rows = (
-        db.query(Item.id.label("item_id"), ImageFeature.feature_vec)
-        .join(ItemImage, ImageFeature.image_id == ItemImage.id)
-        .join(Item, ItemImage.item_id == Item.id)
-        .filter(Item.type == "found")
-        .all()
-    )
-
-    if not candidate_rows:
-        return []
-
-    candidate_vectors: List[List[float]] = []
-    candidate_ids: List[int] = []
-
-    for row in candidate_rows:
-        candidate_ids.append(row.item_id)
-        candidate_vectors.append(json.loads(row.feature_vec))
-
-    try:
-        results = compare_features(query_vector, candidate_vectors, candidate_ids)
-    except Exception as exc:
-        raise HTTPException(status_code=502, detail=f"ML service error: {exc}")
-
-    # results is a list of objects with a score and some id field. Try common keys.
-    def _get_result_id(r: dict) -> int:
-        if "id" in r:
-            return r["id"]
-        if "item_id" in r:
-            return r["item_id"]
-        if "index" in r:
-            # fall back to treating index as candidate index
-            idx = r["index"]
-            if 0 <= idx < len(candidate_ids):
-                return candidate_ids[idx]
-        raise KeyError("No suitable id field in ML result")
-
-    # Sort by score descending
-    sorted_results = sorted(results, key=lambda r: r["score"], reverse=True)
-
-    # Keep only reasonably good matches (e.g. score >= 0.3) and limit to top 5
-    filtered = [r for r in sorted_results if r["score"] >= 0.3][:5]
-    return [MatchResult(item_id=_get_result_id(r), score=r["score"]) for r in filtered]
-
-
-@router.delete("/{item_id}", status_code=204)
-def delete_item(item_id: int, db: Session = Depends(get_db)):
-    item = db.query(Item).filter(Item.id == item_id).first()
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-
-    # Delete associated images explicitly to avoid integrity errors
-    db.query(ItemImage).filter(ItemImage.item_id == item_id).delete(synchronize_session=False)
-
-    db.delete(item)
-    db.commit()
-    return None
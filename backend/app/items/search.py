@@ -0,0 +1,213 @@
+"""Ranked full-text search over item title, description and category.
+
+MySQL and Postgres use their native full-text index when it exists (see the
+DDL attached to ``Item`` in models.py and ``sql/schema.sql``). Any other
+database, or one whose index has not been created yet, falls back to an
+in-process trigram inverted index that is loaded once per worker and kept
+current on item create and delete. Each worker picks up items created by the
+others by id; deletes bump a shared counter (see cache.py), and a worker that
+sees it move drops every indexed id that no longer exists.
+
+Query words match as prefixes everywhere: "wal" finds "wallet".
+"""
+import logging
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import Select, func, literal_column
+from sqlalchemy.dialects.mysql import match as mysql_match
+from sqlalchemy.orm import Session
+
+from ..cache import shared_counters
+from ..models import PG_SEARCH_DOCUMENT, Item, fulltext_index_exists
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+# Share of a query's trigrams an item must contain to count as a match
+_MIN_SIMILARITY = 0.6
+# Extra rank for query trigrams that appear in the title
+_TITLE_BONUS = 0.5
+# Trigram candidates handed to SQL per query for the remaining filters, best first
+_CANDIDATE_CHUNK = 1000
+# Shared counter bumped on every item delete
+_DELETIONS_COUNTER = "item_deletions"
+
+
+def _words(value: Optional[str]) -> List[str]:
+    return _WORD.findall(value.lower()) if value else []
+
+
+def _trigrams(word: str) -> Set[str]:
+    # Pad the front only, so a query word is a trigram subset of any word it prefixes
+    padded = f"  {word}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    def __init__(self):
+        # trigram -> {item_id: True if the trigram occurs in the title}
+        self._postings: Dict[str, Dict[int, bool]] = defaultdict(dict)
+        self._doc_trigrams: Dict[int, Set[str]] = {}
+        # Highest item id loaded from the database; only refresh() advances it
+        self._max_id = 0
+        # Shared deletion count when the index was last checked for deleted items
+        self._deletions: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _add_locked(self, item_id: int, title: Optional[str], description: Optional[str], category: Optional[str]):
+        grams: Dict[str, bool] = {}
+        for value in (description, category):
+            for word in _words(value):
+                grams.update(dict.fromkeys(_trigrams(word), False))
+        for word in _words(title):
+            grams.update(dict.fromkeys(_trigrams(word), True))
+        for gram, in_title in grams.items():
+            self._postings[gram][item_id] = in_title
+        self._doc_trigrams[item_id] = set(grams)
+
+    def add(self, item: Item) -> None:
+        with self._lock:
+            self._add_locked(item.id, item.title, item.description, item.category)
+
+    def _remove_locked(self, item_id: int) -> None:
+        for gram in self._doc_trigrams.pop(item_id, ()):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.pop(item_id, None)
+                if not postings:
+                    del self._postings[gram]
+
+    def remove(self, item_id: int) -> None:
+        with self._lock:
+            self._remove_locked(item_id)
+
+    def refresh(self, db: Session, deletions: Optional[int]) -> None:
+        """Load items created since the last refresh and, once ``deletions`` moves, drop deleted ones.
+
+        Both cover other workers' writes. ``deletions`` is the shared delete
+        counter, read before this call; None skips the deletion check.
+        """
+        if deletions is not None and deletions != self._deletions:
+            live = {row[0] for row in db.query(Item.id).filter(Item.id <= self._max_id)}
+            with self._lock:
+                stale = [item_id for item_id in self._doc_trigrams if item_id not in live]
+                for item_id in stale:
+                    self._remove_locked(item_id)
+            self._deletions = deletions
+            if stale:
+                logger.debug(f"Trigram index dropped {len(stale)} deleted items")
+        rows = (
+            db.query(Item.id, Item.title, Item.description, Item.category)
+            .filter(Item.id > self._max_id)
+            .order_by(Item.id)
+            .all()
+        )
+        if not rows:
+            return
+        with self._lock:
+            for row in rows:
+                self._add_locked(*row)
+            self._max_id = max(self._max_id, rows[-1].id)
+        logger.debug(f"Trigram index loaded {len(rows)} items (max id {self._max_id})")
+
+    def search(self, query: str) -> List[Tuple[int, float]]:
+        """(item_id, score) pairs ranked best first."""
+        grams: Set[str] = set()
+        for word in _words(query):
+            grams |= _trigrams(word)
+        if not grams:
+            return []
+
+        hits: Dict[int, int] = defaultdict(int)
+        title_hits: Dict[int, int] = defaultdict(int)
+        with self._lock:
+            for gram in grams:
+                for item_id, in_title in self._postings.get(gram, {}).items():
+                    hits[item_id] += 1
+                    if in_title:
+                        title_hits[item_id] += 1
+
+        n = len(grams)
+        ranked = [
+            (item_id, (count + _TITLE_BONUS * title_hits[item_id]) / n)
+            for item_id, count in hits.items()
+            if count / n >= _MIN_SIMILARITY
+        ]
+        ranked.sort(key=lambda r: (r[1], r[0]), reverse=True)
+        return ranked
+
+
+_trigram_index = TrigramIndex()
+_native_available: Dict[str, bool] = {}
+
+
+def _has_native_index(db: Session) -> bool:
+    dialect = db.get_bind().dialect.name
+    if dialect not in _native_available:
+        available = fulltext_index_exists(db, dialect)
+        _native_available[dialect] = available
+        logger.info(f"Item search backend: {'native ' + dialect if available else 'trigram fallback'}")
+    return _native_available[dialect]
+
+
+def search_items(db: Session, q: Select, query: str, limit: int) -> List[Item]:
+    """Apply a ranked text search to the ``Item`` select ``q`` and return the best ``limit`` items.
+
+    Takes a sync ``Session``; async routes call it through ``AsyncSession.run_sync``.
+    """
+    words = _words(query)
+    if not words:
+        return []
+
+    if _has_native_index(db):
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            tsquery = func.to_tsquery("simple", " & ".join(f"{w}:*" for w in words))
+            document = literal_column(PG_SEARCH_DOCUMENT)
+            rank = func.ts_rank(document, tsquery)
+            q = q.filter(document.op("@@")(tsquery))
+        else:
+            rank = mysql_match(
+                Item.title, Item.description, Item.category, against=" ".join(f"+{w}*" for w in words)
+            ).in_boolean_mode()
+            q = q.filter(rank > 0)
+        return list(db.execute(q.order_by(rank.desc(), Item.id.desc()).limit(limit)).scalars())
+
+    _trigram_index.refresh(db, _deletion_count())
+    ranked = _trigram_index.search(query)
+    # The SQL filters in q (type, location) run on chunks of the ranked candidates, best first,
+    # until enough pass; cutting the candidates before filtering could drop matching items
+    results: List[Item] = []
+    for start in range(0, len(ranked), _CANDIDATE_CHUNK):
+        scores = dict(ranked[start:start + _CANDIDATE_CHUNK])
+        items = list(db.execute(q.filter(Item.id.in_(list(scores)))).scalars())
+        items.sort(key=lambda item: (scores[item.id], item.id), reverse=True)
+        results.extend(items)
+        if len(results) >= limit:
+            break
+    return results[:limit]
+
+
+def _deletion_count() -> Optional[int]:
+    try:
+        return shared_counters.get(_DELETIONS_COUNTER)
+    except Exception as e:
+        logger.warning(f"⚠ Search deletion counter read failed: {e}")
+        return None
+
+
+def index_item(item: Item) -> None:
+    """Keep the fallback index current; native indexes maintain themselves."""
+    _trigram_index.add(item)
+
+
+def remove_item(item_id: int) -> None:
+    """Drop a deleted item here and tell the other workers' indexes; call after the delete commits."""
+    _trigram_index.remove(item_id)
+    try:
+        shared_counters.incr(_DELETIONS_COUNTER)
+    except Exception as e:
+        logger.warning(f"⚠ Search deletion counter update failed: {e}")
@@ -0,0 +1,171 @@
+"""Content-addressed storage for uploaded item images.
+
+Uploads are streamed to a temporary file in fixed-size chunks while being
+hashed, checked to be an image PIL can decode, then renamed to
+``<sha256><ext>`` with the extension of the decoded format. Identical photos share one file,
+and because a name can never point at different bytes, the files (and their
+resized derivatives) are served with an immutable, year-long
+``Cache-Control``.
+
+``RequestSizeLimitMiddleware`` caps whole request bodies, since Starlette
+spools a multipart body to disk before ``store_upload`` ever runs.
+"""
+import hashlib
+import logging
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import NamedTuple
+
+import anyio
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from fastapi.staticfiles import StaticFiles
+from PIL import Image
+from starlette.exceptions import HTTPException as StarletteHTTPException
+
+from ..config import settings
+from . import derivatives
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+# Formats PIL (and so the ML service and derivatives) can decode, by PIL format name
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "GIF": ".gif", "BMP": ".bmp"}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+_HASHED_NAME = re.compile(r"^[0-9a-f]{64}(_thumb|_medium)?\.\w+$")
+
+
+class StoredImage(NamedTuple):
+    filename: str
+    content_hash: str
+    size: int
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Images must be at most {settings.max_upload_bytes} bytes")
+
+
+def _image_extension(path: Path) -> str:
+    """Extension for the image at ``path``; raises ValueError if PIL cannot read it as one."""
+    try:
+        with Image.open(path) as img:
+            image_format = img.format
+            img.verify()
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError(str(e)) from e
+    extension = FORMAT_EXTENSIONS.get(image_format or "")
+    if extension is None:
+        raise ValueError(f"unsupported format {image_format}")
+    return extension
+
+
+async def store_upload(upload: UploadFile, directory: Path) -> StoredImage:
+    """Stream ``upload`` into ``directory`` under its content hash; memory use stays at one chunk."""
+    if upload.size is not None and upload.size > settings.max_upload_bytes:
+        raise _too_large()
+
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = directory / f".upload-{uuid.uuid4().hex}.part"
+    try:
+        async with await anyio.open_file(tmp_path, "wb") as out:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > settings.max_upload_bytes:
+                    raise _too_large()
+                digest.update(chunk)
+                await out.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail=f"Image {upload.filename} is empty")
+
+        try:
+            extension = await anyio.to_thread.run_sync(_image_extension, tmp_path)
+        except ValueError as e:
+            logger.warning(f"⚠ Rejected upload {upload.filename}: {e}")
+            raise HTTPException(status_code=415, detail=f"{upload.filename} is not a supported image") from e
+
+        content_hash = digest.hexdigest()
+        filename = f"{content_hash}{extension}"
+        target = directory / filename
+        if await anyio.Path(target).exists():
+            logger.debug(f"Image {upload.filename} already stored as {filename}")
+        else:
+            # Same directory, so the rename is atomic and readers never see a partial file
+            await anyio.to_thread.run_sync(os.replace, tmp_path, target)
+        return StoredImage(filename, content_hash, size)
+    finally:
+        await anyio.Path(tmp_path).unlink(missing_ok=True)
+
+
+def _request_too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Requests must be at most {max_bytes} bytes")
+
+
+class RequestSizeLimitMiddleware:
+    """Refuse request bodies over ``max_bytes`` before any of it is written to disk.
+
+    A declared ``Content-Length`` over the limit is answered with 413 without
+    reading the body; a chunked body fails with 413 as soon as it passes it.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            error = _request_too_large(self.max_bytes)
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside body parsing, so FastAPI answers with the 413 itself
+                    raise _request_too_large(self.max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles that marks content-addressed files as cacheable forever.
+
+    A request for a derivative that is not on disk renders it from the
+    original before answering, instead of returning 404.
+    """
+
+    async def get_response(self, path, scope):
+        try:
+            return await super().get_response(path, scope)
+        except StarletteHTTPException as exc:
+            if exc.status_code != 404 or self.directory is None:
+                raise
+            regenerated = await anyio.to_thread.run_sync(
+                derivatives.regenerate, Path(self.directory), os.path.basename(path)
+            )
+            if not regenerated:
+                raise
+            return await super().get_response(path, scope)
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if _HASHED_NAME.match(os.path.basename(full_path)):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
@@ -1,45 +1,66 @@
+import time
+
+_import_started = time.perf_counter()
+
 import logging
+from contextlib import asynccontextmanager
+from pathlib import Path
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 from .auth.routes import router as auth_router
 from .items.routes import router as items_router
-from .database import engine
-from .models import Base
+from .items.storage import ImmutableStaticFiles, RequestSizeLimitMiddleware
+from .config import settings
+from .database import async_engine
+from .ml import client as ml_client
+from .ml.jobs import feature_jobs
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=settings.log_level.upper())
 logger = logging.getLogger(__name__)
 
 logger.info("=" * 80)
 logger.info("Starting Lost & Found Portal API initialization")
 logger.info("=" * 80)
+# Schema changes run once per deploy via `python -m app.migrate`, not in every worker
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    steps = {}
+
+    step = time.perf_counter()
+    Path(settings.static_dir).mkdir(parents=True, exist_ok=True)
+    steps["static_dir"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    await feature_jobs.start()
+    steps["feature_jobs"] = time.perf_counter() - step
+
+    timings = ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in steps.items())
+    logger.info(
+        f"✓ Worker ready: imported in {IMPORT_SECONDS * 1000:.0f}ms, "
+        f"started in {(time.perf_counter() - started) * 1000:.1f}ms ({timings})"
+    )
+    yield
+    await feature_jobs.stop()
+    await ml_client.close()
+    if async_engine is not None:
+        await async_engine.dispose()
 
-# Test database connection (non-blocking)
-if engine is not None:
-    try:
-        logger.info("Testing database connection...")
-        with engine.connect() as conn:
-            logger.info("✓ Database connection successful!")
-            conn.close()
-        
-        # Create tables
-        try:
-            logger.info("Creating database tables...")
-            Base.metadata.create_all(bind=engine)
-            logger.info("✓ Database tables created/verified successfully!")
-        except Exception as e:
-            logger.error(f"⚠ Failed to create database tables: {e}")
-    except Exception as e:
-        logger.warning(f"⚠ Database not ready yet (will retry on requests): {e}")
-else:
-    logger.warning("⚠ Database engine not initialized - will retry on first request")
 
 # Initialize FastAPI app
-app = FastAPI(title="Lost & Found Portal API")
+app = FastAPI(title="Lost & Found Portal API", lifespan=lifespan)
 logger.info("✓ FastAPI app initialized")
 
+# Cap request bodies before Starlette spools multipart uploads to disk; added before CORS so
+# that CORS stays outermost and browsers can read the 413
+app.add_middleware(RequestSizeLimitMiddleware, max_bytes=settings.max_request_bytes)
+logger.info(f"✓ Request size limit set to {settings.max_request_bytes} bytes")
+
 # Add CORS middleware
 try:
     app.add_middleware(
@@ -48,6 +69,8 @@ try:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Let browser clients read the pagination cursor and revalidate with ETags
+        expose_headers=["X-Next-Cursor", "ETag"],
     )
     logger.info("✓ CORS middleware configured")
 except Exception as e:
@@ -56,7 +79,8 @@ except Exception as e:
 
 # Mount static files
 try:
-    app.mount("/static", StaticFiles(directory="static"), name="static")
+    # The directory is created at startup, after the app is built
+    app.mount("/static", ImmutableStaticFiles(directory=settings.static_dir, check_dir=False), name="static")
     logger.info("✓ Static files mounted at /static")
 except Exception as e:
     logger.warning(f"⚠ Static files mount warning: {e}")
@@ -78,3 +102,7 @@ except Exception as e:
 @app.get("/")
 async def root():
     return {"message": "Lost & Found Portal API is running"}
+
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+logger.info(f"✓ App module imported in {IMPORT_SECONDS * 1000:.0f}ms")
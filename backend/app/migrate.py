@@ -0,0 +1,222 @@
+"""One-time schema setup, run before the API workers start.
+
+    python -m app.migrate [--wait 60]
+
+Creates missing tables, then adds columns and indexes that were introduced
+after a table was first created (``create_all`` never alters an existing
+table), and renames feature vectors that older versions stored under the
+wrong model name. Every step is a no-op once applied, so running it on
+every deploy is safe. Workers no longer touch the schema when they boot.
+"""
+import argparse
+import logging
+import sys
+import time
+
+from datetime import datetime
+from typing import List, Tuple
+
+from sqlalchemy import delete, exists, insert, inspect, literal, select, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.types import SchemaType
+
+from .config import settings
+from .database import Base, SessionLocal, engine
+# Importing models also registers every table on Base.metadata
+from .models import (
+    FULLTEXT_INDEX_DDL,
+    FULLTEXT_INDEX_NAME,
+    FeatureCacheEntry,
+    FeatureJob,
+    ImageFeature,
+    ItemImage,
+    fulltext_index_exists,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def wait_for_database(timeout: float) -> None:
+    """Retry connecting until the database answers or ``timeout`` seconds pass."""
+    deadline = time.monotonic() + timeout
+    delay = 0.5
+    while True:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            logger.info("✓ Database connection successful")
+            return
+        except Exception as e:
+            if time.monotonic() + delay > deadline:
+                raise
+            logger.warning(f"⚠ Database not ready yet, retrying in {delay:.1f}s: {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, 5)
+
+
+# Labels that older versions stored for vectors another model computed. The ML
+# service always loaded yolov8n.pt, but its vectors were saved as "yolov11n".
+LEGACY_MODEL_LABELS = {"yolov11n": "yolov8n"}
+
+
+def relabel_vectors(conn: Connection, old_model: str, model: str) -> Tuple[int, int]:
+    """Rename vectors stored under ``old_model`` to ``model``; returns (feature rows, cache rows)."""
+    already_cached = select(FeatureCacheEntry.content_hash).where(FeatureCacheEntry.model_name == model)
+    # Selected first: MySQL cannot delete from a table its own subquery reads
+    duplicates = conn.execute(
+        select(FeatureCacheEntry.id).where(
+            FeatureCacheEntry.model_name == old_model, FeatureCacheEntry.content_hash.in_(already_cached)
+        )
+    ).scalars().all()
+    if duplicates:
+        conn.execute(delete(FeatureCacheEntry).where(FeatureCacheEntry.id.in_(duplicates)))
+    cache_rows = conn.execute(
+        update(FeatureCacheEntry).where(FeatureCacheEntry.model_name == old_model).values(model_name=model)
+    ).rowcount
+    feature_rows = conn.execute(
+        update(ImageFeature).where(ImageFeature.model_name == old_model).values(model_name=model)
+    ).rowcount
+    return feature_rows, cache_rows
+
+
+def _relabel_legacy_vectors(conn: Connection) -> int:
+    """Give legacy vectors their real model's name; returns the feature rows now under FEATURE_MODEL."""
+    relabelled = 0
+    for old_model, model in LEGACY_MODEL_LABELS.items():
+        feature_rows, cache_rows = relabel_vectors(conn, old_model, model)
+        if feature_rows or cache_rows:
+            logger.info(f"✓ Relabelled {feature_rows} feature rows and {cache_rows} cache rows from {old_model} to {model}")
+        if model == settings.feature_model:
+            relabelled += feature_rows
+    return relabelled
+
+
+def _backfill_feature_status(conn: Connection) -> None:
+    """Existing images got the column default, ``pending``, but have no feature job behind it.
+
+    Images that already have a vector for ``FEATURE_MODEL`` are ``done``; the
+    rest get a job, like a new upload, so the workers extract them (or mark
+    them ``failed``).
+    """
+    has_vector = exists().where(
+        ImageFeature.image_id == ItemImage.id, ImageFeature.model_name == settings.feature_model
+    )
+    done = conn.execute(update(ItemImage).where(has_vector).values(feature_status="done")).rowcount
+    queued = conn.execute(
+        insert(FeatureJob).from_select(
+            ["image_id", "status", "run_after"],
+            select(ItemImage.id, literal("pending"), literal(datetime.utcnow())).where(~has_vector),
+        )
+    ).rowcount
+    logger.info(f"✓ Marked {done} existing images as extracted and queued {queued} for extraction")
+
+
+# Data fixes for rows that existed before a column was added, keyed by "table.column"
+BACKFILLS = {
+    "item_images.feature_status": _backfill_feature_status,
+}
+
+
+def _add_missing_columns(conn: Connection) -> List[str]:
+    inspector = inspect(conn)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+            if not column.nullable:
+                # Existing rows need a value: use the model's scalar default
+                if column.default is None or not column.default.is_scalar:
+                    logger.warning(f"⚠ Cannot add NOT NULL column {table.name}.{column.name} without a default")
+                    continue
+                default = literal(column.default.arg).compile(
+                    dialect=conn.dialect, compile_kwargs={"literal_binds": True}
+                )
+                ddl += f" NOT NULL DEFAULT {default}"
+            if isinstance(column.type, SchemaType):
+                # e.g. a Postgres ENUM type, which create_all only makes along with a new table
+                column.type.create(conn, checkfirst=True)
+            conn.execute(text(ddl))
+            logger.info(f"✓ Added column {table.name}.{column.name} ({column_type})")
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def _add_missing_indexes(conn: Connection) -> int:
+    inspector = inspect(conn)
+    added = 0
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            conn.execute(CreateIndex(index))
+            logger.info(f"✓ Created index {index.name} on {table.name}")
+            added += 1
+    # The full-text index is raw DDL rather than an Index, so table.indexes does not list it
+    dialect = conn.dialect.name
+    if dialect in FULLTEXT_INDEX_DDL and not fulltext_index_exists(conn, dialect):
+        conn.execute(FULLTEXT_INDEX_DDL[dialect])
+        logger.info(f"✓ Created index {FULLTEXT_INDEX_NAME} on items")
+        added += 1
+    return added
+
+
+def _rebuild_matching() -> None:
+    # Imported here: the matching modules are only needed when vectors were relabelled
+    from .items import matches
+
+    db = SessionLocal()
+    try:
+        dropped = matches.rebuild_all(db)
+        logger.info(f"✓ Rebuilt the feature store and dropped {dropped} stored matches; lists recompute on read")
+    finally:
+        db.close()
+
+
+def migrate(wait: float = 60) -> None:
+    if engine is None:
+        raise RuntimeError("Database engine is not configured")
+    started = time.perf_counter()
+    wait_for_database(wait)
+
+    # Tables first; their columns and indexes come with them
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        columns = _add_missing_columns(conn)
+        # Before the backfills, which count an image as extracted only with a FEATURE_MODEL vector
+        relabelled = _relabel_legacy_vectors(conn)
+        for name in columns:
+            if name in BACKFILLS:
+                BACKFILLS[name](conn)
+    if relabelled:
+        # Matching ignored these vectors until now; rebuild it around them
+        _rebuild_matching()
+    # Separate transaction: the inspector must see the columns added above
+    with engine.begin() as conn:
+        indexes = _add_missing_indexes(conn)
+    logger.info(
+        f"✓ Schema up to date in {time.perf_counter() - started:.2f}s "
+        f"({len(columns)} columns and {indexes} indexes added)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wait", type=float, default=60, help="seconds to wait for the database to come up")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        migrate(args.wait)
+    except Exception as e:
+        logger.error(f"✗ Migration failed: {e}", exc_info=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,22 @@
-from typing import List
+"""Async client for the ML feature service.
+
+One pooled ``httpx.AsyncClient`` per process keeps connections alive between
+calls. Every operation has its own timeout, transient failures are retried
+with jittered exponential backoff, and a circuit breaker fails fast while the
+service keeps failing so a degraded ML box cannot pin backend workers.
+"""
+import asyncio
+import logging
 import os
+import random
+import time
+from typing import List, NamedTuple, Optional, Sequence
+
+import httpx
 
-import requests
+from ..config import settings
+
+logger = logging.getLogger(__name__)
 
 ML_BASE_URL = os.getenv("ML_SERVICE_URL", "https://affirmatory-zenaida-affectedly.ngrok-free.dev")
 
@@ -11,20 +26,151 @@ NGROK_HEADERS = {
     "User-Agent": "FastAPI-Backend"
 }
 
+# Gateway errors usually mean the service is restarting or overloaded; only these count as outages
+RETRYABLE_STATUS = {502, 503, 504}
+
+
+class ExtractedFeatures(NamedTuple):
+    model: str  # model that produced the vectors, as reported by the service
+    vectors: List[List[float]]
+
+
+class MLServiceUnavailable(Exception):
+    """Raised without calling the ML service while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Open after ``failure_threshold`` consecutive failures, probe again after ``reset_timeout``."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # Set while a single trial call is in flight; expires in case the call never reports back
+        self.probe_started: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at < self.reset_timeout:
+            return False
+        if self.probe_started is not None and now - self.probe_started < self.reset_timeout:
+            return False
+        # Let exactly one call through to test the service
+        self.probe_started = now
+        return True
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info("✓ ML service recovered, circuit closed")
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.probe_started is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"⚠ ML service failed {self.failures} times in a row, opening circuit")
+            self.opened_at = time.monotonic()
+            self.probe_started = None
+
+
+breaker = CircuitBreaker(
+    failure_threshold=settings.ml_breaker_failures,
+    reset_timeout=settings.ml_breaker_reset_seconds,
+)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=ML_BASE_URL,
+            headers=NGROK_HEADERS,
+            limits=httpx.Limits(
+                max_connections=settings.ml_max_connections,
+                max_keepalive_connections=settings.ml_max_connections,
+            ),
+        )
+    return _client
+
+
+async def close() -> None:
+    """Close pooled connections; called when the application shuts down."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def is_outage(error: Exception) -> bool:
+    """Whether ``error`` means the service is down or overloaded, rather than rejecting this request."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS
+    return isinstance(error, httpx.TransportError)
+
+
+def rejected_image_index(error: Exception) -> Optional[int]:
+    """Position of the image the service could not decode, from its 422 response; None otherwise."""
+    if not isinstance(error, httpx.HTTPStatusError) or error.response.status_code != 422:
+        return None
+    try:
+        detail = error.response.json().get("detail")
+    except ValueError:
+        return None
+    index = detail.get("index") if isinstance(detail, dict) else None
+    return index if isinstance(index, int) else None
+
+
+async def _post(path: str, timeout: float, **kwargs) -> dict:
+    """POST with retries; raises MLServiceUnavailable while the circuit is open.
+
+    Only outages (see ``is_outage``) are retried and counted by the breaker.
+    Any other error response, such as a 422 for an undecodable image or a 500
+    for one bad input, is raised at once and leaves the breaker alone.
+    """
+    timeouts = httpx.Timeout(timeout, connect=settings.ml_connect_timeout)
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise MLServiceUnavailable(f"ML service circuit is {breaker.state}")
+        try:
+            resp = await _get_client().post(path, timeout=timeouts, **kwargs)
+            resp.raise_for_status()
+        except (httpx.HTTPStatusError, httpx.TransportError) as e:
+            if not is_outage(e):
+                raise
+            breaker.record_failure()
+            if attempt >= settings.ml_max_retries:
+                raise
+            error = e
+        else:
+            breaker.record_success()
+            return resp.json()
+
+        delay = random.uniform(0, settings.ml_retry_backoff * 2 ** attempt)
+        logger.debug(f"ML service {path} failed ({error!r}), retrying in {delay:.2f}s")
+        attempt += 1
+        await asyncio.sleep(delay)
 
-def extract_features(image_bytes: bytes) -> List[float]:
-    files = {"image": ("image.jpg", image_bytes, "image/jpeg")}
-    resp = requests.post(f"{ML_BASE_URL}/features/extract", files=files, headers=NGROK_HEADERS)
-    resp.raise_for_status()
-    return resp.json()["vector"]
 
+async def extract_features_batch(images: Sequence[bytes]) -> ExtractedFeatures:
+    """Extract features for several images in one request; vectors come back in order."""
+    files = [("images", (f"image_{i}.jpg", image_bytes, "image/jpeg")) for i, image_bytes in enumerate(images)]
+    data = await _post("/features/extract_batch", settings.ml_extract_timeout, files=files)
+    # Services from before models were reported always ran the default weights
+    return ExtractedFeatures(data.get("model", "yolov8n"), data["vectors"])
 
-def compare_features(query_vector: List[float], candidate_vectors: List[List[float]], candidate_ids: List[int]):
-    payload = {
-        "query_vector": query_vector,
-        "candidate_vectors": candidate_vectors,
-        "candidate_ids": candidate_ids,
-    }
-    resp = requests.post(f"{ML_BASE_URL}/features/compare", json=payload, headers=NGROK_HEADERS)
-    resp.raise_for_status()
-    return resp.json()["results"]
@@ -0,0 +1,354 @@
+"""Shared, memory-mapped matrix of FOUND item feature vectors.
+
+Every gunicorn worker maps the same files, so the matrix is built once from
+the database and afterwards only updated incrementally when found items are
+created or deleted. Each feature model has its own directory under
+``settings.feature_store_dir``, holding:
+
+- ``header``: magic, vector dim, file epoch, row count and a generation counter
+- ``ids.<epoch>.i64``: one little-endian int64 item id per row (-1 = deleted)
+- ``vectors.<epoch>.f32``: ``count x dim`` little-endian float32 rows
+
+Appends and tombstones keep the current epoch; a rebuild or compaction writes
+a fresh epoch and swaps the header, so readers never see a half-written file.
+
+Vectors are per-class detection confidences and almost all zeros, so each
+worker also keeps a ``ClassIndex``: postings from class id to the rows that
+detected it. The index only prunes candidates: a search looks up the rows
+sharing at least one class with the query images (every other row scores
+exactly 0), then scores just those rows with one dense multiply against the
+mapped matrix. Postings hold row numbers only, not weights; the weights
+stay in the shared file rather than being copied into every worker, and the
+dense product scores all of a lost item's images at once.
+"""
+import logging
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: only the in-process lock applies
+    fcntl = None
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("<4sIIQQ")
+_MAGIC = b"LFFS"
+_TOMBSTONE = -1
+# Rewrite the files once more than this fraction of rows are deleted
+_COMPACT_RATIO = 0.25
+
+Loader = Callable[[], Tuple[Sequence[int], Sequence[Sequence[float]]]]
+
+
+class ClassIndex:
+    """Inverted index from class id to the rows that detected it, stored CSR-style.
+
+    Used for candidate pruning only; scores come from the stored vectors.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.rows = 0  # store rows indexed so far
+        self._row_ids = np.empty(0, dtype=np.int64)
+        self._classes = np.empty(0, dtype=np.int64)
+        self._indptr = np.zeros(dim + 1, dtype=np.int64)
+
+    @property
+    def postings(self) -> int:
+        return int(self._row_ids.size)
+
+    def extended(self, vectors: np.ndarray) -> "ClassIndex":
+        """A new index over all of ``vectors``, reusing this index's postings for ``vectors[:self.rows]``.
+
+        Indexes are never modified once built, so searches can keep using an
+        older one while a newer one is built.
+        """
+        new_rows, new_classes = np.nonzero(np.asarray(vectors[self.rows:]))
+        classes = np.concatenate([self._classes, new_classes])
+        row_ids = np.concatenate([self._row_ids, new_rows + self.rows])
+        order = np.argsort(classes, kind="stable")
+        index = ClassIndex(self.dim)
+        index._classes, index._row_ids = classes[order], row_ids[order]
+        index._indptr = np.searchsorted(index._classes, np.arange(self.dim + 1))
+        index.rows = len(vectors)
+        return index
+
+    def candidates(self, queries: np.ndarray) -> np.ndarray:
+        """Sorted rows sharing a non-zero class with any of ``queries``."""
+        classes = np.flatnonzero(np.any(queries != 0, axis=0))
+        if classes.size == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate([self._row_ids[self._indptr[c]:self._indptr[c + 1]] for c in classes]))
+
+
+class FeatureStore:
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._header_path = self.directory / "header"
+        self._lock_path = self.directory / "lock"
+        self._local_lock = threading.Lock()
+        # Reader-side view, refreshed whenever the header generation changes; one thread remaps at a time
+        self._view_lock = threading.Lock()
+        self._generation: Optional[int] = None
+        self._epoch: Optional[int] = None
+        self._view: Tuple[np.ndarray, np.ndarray, ClassIndex] = (
+            np.empty(0, dtype="<i8"),
+            np.empty((0, 0), dtype="<f4"),
+            ClassIndex(0),
+        )
+
+    @property
+    def exists(self) -> bool:
+        return self._header_path.exists()
+
+    def _ids_path(self, epoch: int) -> Path:
+        return self.directory / f"ids.{epoch}.i64"
+
+    def _vectors_path(self, epoch: int) -> Path:
+        return self.directory / f"vectors.{epoch}.f32"
+
+    def _read_header(self) -> Tuple[int, int, int, int]:
+        magic, dim, epoch, count, generation = _HEADER.unpack(self._header_path.read_bytes())
+        if magic != _MAGIC:
+            raise ValueError(f"Not a feature store header: {self._header_path}")
+        return dim, epoch, count, generation
+
+    def _write_header(self, dim: int, epoch: int, count: int, generation: int) -> None:
+        tmp = self._header_path.with_suffix(".tmp")
+        tmp.write_bytes(_HEADER.pack(_MAGIC, dim, epoch, count, generation))
+        os.replace(tmp, self._header_path)
+
+    @contextmanager
+    def _exclusive(self):
+        """Serialize writers across threads and, where supported, processes."""
+        with self._local_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, "a+b") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _snapshot(self) -> Tuple[np.ndarray, np.ndarray, ClassIndex]:
+        """Return (ids, vectors, index), remapping the files if another worker wrote to them."""
+        if not self.exists:
+            return self._view
+        if self._read_header()[3] == self._generation:
+            return self._view
+
+        with self._view_lock:
+            while True:
+                dim, epoch, count, generation = self._read_header()
+                if generation == self._generation:
+                    # Another thread remapped while this one waited for the lock
+                    return self._view
+                if count == 0:
+                    ids, vectors = np.empty(0, dtype="<i8"), np.empty((0, dim), dtype="<f4")
+                    break
+                try:
+                    ids = np.memmap(self._ids_path(epoch), dtype="<i8", mode="r", shape=(count,))
+                    vectors = np.memmap(self._vectors_path(epoch), dtype="<f4", mode="r", shape=(count, dim))
+                    break
+                except FileNotFoundError:
+                    # A compaction swapped epochs between reading the header and mapping
+                    continue
+
+            # Appends keep the epoch and only add rows, so only the new rows need indexing
+            index = self._view[2]
+            if epoch != self._epoch or index.dim != dim or index.rows > count:
+                index = ClassIndex(dim)
+            index = index.extended(vectors)
+
+            # The view goes first: a reader that sees the new generation must also see its view
+            self._view = (ids, vectors, index)
+            self._epoch = epoch
+            self._generation = generation
+        logger.debug(
+            f"Feature store remapped: {count} rows, dim {dim}, generation {generation}, "
+            f"{index.postings} class postings"
+        )
+        return self._view
+
+    def _write_epoch(self, item_ids: np.ndarray, matrix: np.ndarray, dim: int) -> None:
+        """Write a complete new epoch and switch the header to it. Caller holds the lock."""
+        if self.exists:
+            _, old_epoch, _, generation = self._read_header()
+        else:
+            old_epoch, generation = None, 0
+        epoch = 0 if old_epoch is None else old_epoch + 1
+
+        self._ids_path(epoch).write_bytes(np.ascontiguousarray(item_ids, dtype="<i8").tobytes())
+        self._vectors_path(epoch).write_bytes(np.ascontiguousarray(matrix, dtype="<f4").tobytes())
+        self._write_header(dim, epoch, len(item_ids), generation + 1)
+
+        if old_epoch is not None and old_epoch != epoch:
+            # Workers that still map the old files keep them alive until they remap
+            self._ids_path(old_epoch).unlink(missing_ok=True)
+            self._vectors_path(old_epoch).unlink(missing_ok=True)
+
+    def ensure(self, loader: Loader) -> None:
+        """Build the store from ``loader`` unless another worker already did."""
+        if self.exists:
+            return
+        with self._exclusive():
+            if self.exists:
+                return
+            item_ids, vectors = loader()
+            self._rebuild_locked(item_ids, vectors)
+
+    def rebuild(self, item_ids: Sequence[int], vectors: Sequence[Sequence[float]]) -> None:
+        with self._exclusive():
+            self._rebuild_locked(item_ids, vectors)
+
+    def _rebuild_locked(self, item_ids: Sequence[int], vectors: Sequence[Sequence[float]]) -> None:
+        ids = np.asarray(item_ids, dtype="<i8")
+        if len(ids):
+            matrix = np.asarray(vectors, dtype="<f4")
+        else:
+            matrix = np.empty((0, 0), dtype="<f4")
+        if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+            raise ValueError("Feature store rebuild needs one vector per item id")
+        self._write_epoch(ids, matrix, matrix.shape[1])
+        logger.info(f"✓ Feature store rebuilt with {len(ids)} rows")
+
+    def add(self, item_id: int, vectors: Sequence[Sequence[float]]) -> None:
+        """Append one row per image of a found item.
+
+        Does nothing while the store has not been built: the first search
+        builds it from the database, which already holds these vectors.
+        """
+        rows = np.asarray(vectors, dtype="<f4")
+        if rows.ndim == 1:
+            rows = rows[None, :]
+        if rows.size == 0:
+            return
+
+        with self._exclusive():
+            if not self.exists:
+                # Creating the store here would hold only this item and hide every other found item
+                return
+            dim, epoch, count, generation = self._read_header()
+            if count == 0:
+                dim = rows.shape[1]
+            if rows.shape[1] != dim:
+                raise ValueError(f"Feature dim {rows.shape[1]} does not match store dim {dim}")
+
+            # Truncate first so a crash between append and header write cannot misalign rows
+            with open(self._vectors_path(epoch), "ab") as fh:
+                fh.truncate(count * dim * 4)
+                fh.write(rows.tobytes())
+            with open(self._ids_path(epoch), "ab") as fh:
+                fh.truncate(count * 8)
+                fh.write(np.full(len(rows), item_id, dtype="<i8").tobytes())
+            self._write_header(dim, epoch, count + len(rows), generation + 1)
+
+    def remove(self, item_id: int) -> int:
+        """Tombstone every row of ``item_id``; returns the number of rows removed."""
+        with self._exclusive():
+            if not self.exists:
+                return 0
+            dim, epoch, count, generation = self._read_header()
+            if count == 0:
+                return 0
+
+            ids = np.memmap(self._ids_path(epoch), dtype="<i8", mode="r+", shape=(count,))
+            hits = ids == item_id
+            removed = int(np.count_nonzero(hits))
+            if removed:
+                ids[hits] = _TOMBSTONE
+                ids.flush()
+                self._write_header(dim, epoch, count, generation + 1)
+
+            live = ids != _TOMBSTONE
+            if count - int(np.count_nonzero(live)) > count * _COMPACT_RATIO:
+                vectors = np.memmap(self._vectors_path(epoch), dtype="<f4", mode="r", shape=(count, dim))
+                self._write_epoch(np.array(ids[live]), np.array(vectors[live]), dim)
+                logger.info(f"✓ Feature store compacted to {int(np.count_nonzero(live))} rows")
+                del vectors
+            del ids
+            return removed
+
+    def search(
+        self,
+        queries: Sequence[Sequence[float]],
+        top_k: int,
+        min_score: float,
+        reduce: str = "max",
+        candidates: Optional[Sequence[int]] = None,
+    ) -> List[Tuple[int, float]]:
+        """Score every image of a lost item against the stored rows and return the best ``top_k`` items.
+
+        ``queries`` holds one vector per lost-item image (a single vector is
+        fine too). Vectors are L2-normalized by the ML service, so a dot product
+        is the cosine similarity. Each query image keeps its best-scoring image
+        of every found item; ``reduce`` then combines those per item: ``max``
+        takes the single best pair, ``mean`` averages over the query images so
+        items resembling all of the lost item's photos rank first. When given,
+        only items in ``candidates`` are scored.
+        """
+        if reduce not in ("max", "mean"):
+            raise ValueError(f"Unknown match reduction {reduce!r}")
+        ids, vectors, index = self._snapshot()
+        if len(ids) == 0:
+            return []
+
+        q = np.atleast_2d(np.asarray(queries, dtype="<f4"))
+        if q.ndim != 2 or q.shape[1] != vectors.shape[1] or q.shape[0] == 0:
+            logger.warning(f"⚠ Query shape {q.shape} does not match feature store dim {vectors.shape[1]}")
+            return []
+
+        if min_score >= 0:
+            # Rows without a class in common with any query image score 0 against all of them
+            rows = index.candidates(q)
+        else:
+            rows = np.arange(len(ids))
+        # Read the ids once: remove() tombstones rows in place, so a second read could disagree with the first
+        row_items = np.array(ids[rows])
+        keep = row_items != _TOMBSTONE
+        if candidates is not None:
+            keep &= np.isin(row_items, np.asarray(candidates, dtype=np.int64))
+        rows, row_items = rows[keep], row_items[keep]
+        logger.debug(f"Scoring {rows.size} of {len(ids)} feature store rows against {q.shape[0]} images")
+        if rows.size == 0:
+            return []
+
+        # One multiply for every (row, query image) pair; rows are sorted so each item's rows are contiguous
+        order = np.argsort(row_items, kind="stable")
+        row_items = row_items[order]
+        scores = np.asarray(vectors[rows[order]]) @ q.T
+        starts = np.flatnonzero(np.r_[True, row_items[1:] != row_items[:-1]])
+        item_ids = row_items[starts]
+        per_image = np.maximum.reduceat(scores, starts, axis=0)
+        best = per_image.max(axis=1) if reduce == "max" else per_image.mean(axis=1)
+
+        passing = np.flatnonzero(best > min_score)
+        if passing.size == 0:
+            return []
+        item_ids, best = item_ids[passing], best[passing]
+
+        k = min(top_k, best.size)
+        # Partition for the k-th best score, then order ties by item id so results are stable
+        kth = -np.partition(-best, k - 1)[k - 1]
+        top = np.flatnonzero(best >= kth)
+        top = top[np.lexsort((item_ids[top], -best[top]))][:k]
+        return [(int(item_ids[i]), float(best[i])) for i in top]
+
+
+@lru_cache(maxsize=1)
+def get_feature_store() -> FeatureStore:
+    """Open the feature store once per worker process."""
+    return FeatureStore(str(Path(settings.feature_store_dir) / settings.feature_model))
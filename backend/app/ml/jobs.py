@@ -0,0 +1,373 @@
+"""Database-backed queue that extracts image features off the request path.
+
+Upload routes only write the image files, the ``ItemImage`` rows and one
+``FeatureJob`` row per image. A bounded pool of asyncio workers claims
+pending jobs in batches, sends each batch to the ML service in one request,
+stores the vectors and updates ``ItemImage.feature_status``. Failed jobs
+are retried with exponential backoff until ``feature_job_max_attempts``.
+
+A batch mixes uploads from every item and user, so one bad image must not
+fail the rest. A photo the service cannot decode is failed on its own, and
+other errors split the batch in halves until the failing job is isolated;
+only that job is charged an attempt.
+
+Vectors are also kept per image content hash in ``feature_cache``, so a
+photo that was already processed (a re-post, or the same picture on a lost
+and a found report) is served from there without calling the ML service.
+
+Every gunicorn worker runs its own pool; claims use ``SKIP LOCKED`` where
+the database supports it, so a job is only ever processed by one of them.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import httpx
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..cache import ITEMS_NAMESPACE, response_cache
+from ..config import settings
+from ..database import SessionLocal
+from ..items import matches
+from ..models import FeatureCacheEntry, FeatureJob, ImageFeature, Item, ItemImage
+from .client import MLServiceUnavailable, extract_features_batch, is_outage, rejected_image_index
+from .feature_store import get_feature_store
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureModelMismatch(ValueError):
+    """The ML service runs a different model than ``FEATURE_MODEL``; affects every job alike."""
+
+
+class RejectedImage(Exception):
+    """The ML service could not decode the photo with this cache key."""
+
+    def __init__(self, cache_key: str, detail: str):
+        super().__init__(detail)
+        self.cache_key = cache_key
+
+
+class ClaimedJob(NamedTuple):
+    job_id: int
+    image_id: int
+    attempts: int
+    path: Path
+    content_hash: Optional[str]
+
+    @property
+    def cache_key(self) -> str:
+        # Images uploaded before content hashing are never shared
+        return self.content_hash or f"job:{self.job_id}"
+
+
+class FeatureJobQueue:
+    def __init__(
+        self,
+        workers: int,
+        batch_size: int,
+        max_attempts: int,
+        poll_interval: float,
+        retry_backoff: float,
+        stale_after: float,
+    ):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.retry_backoff = retry_backoff
+        self.stale_after = stale_after
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def enqueue(self, db: Session, image_rows: Sequence[ItemImage]) -> None:
+        """Add one job per image to the caller's transaction."""
+        now = datetime.utcnow()
+        for image_row in image_rows:
+            image_row.feature_status = "pending"
+            db.add(FeatureJob(image_id=image_row.id, status="pending", run_after=now))
+
+    def notify(self) -> None:
+        """Wake idle workers after the enqueuing transaction has committed."""
+        if self._loop is None or self._wakeup is None:
+            return
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def start(self) -> None:
+        if self._tasks or SessionLocal is None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        logger.info(f"✓ Feature job queue started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("✓ Feature job queue stopped")
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            try:
+                jobs = await run_in_threadpool(self._claim)
+            except Exception as e:
+                logger.error(f"✗ Feature worker {n} failed to claim jobs: {e}")
+                jobs = []
+
+            if not jobs:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            logger.debug(f"Feature worker {n} claimed {len(jobs)} jobs")
+            await self._process(jobs)
+
+    async def _process(self, jobs: List[ClaimedJob]) -> None:
+        try:
+            vectors, fresh = await self._extract(jobs)
+        except MLServiceUnavailable as e:
+            # The circuit is open; wait it out without using up the jobs' attempts
+            logger.debug(f"Deferring {len(jobs)} feature jobs: {e}")
+            await run_in_threadpool(self._fail, jobs, str(e), False)
+            return
+        except RejectedImage as e:
+            # Fail the photo the service cannot decode at once; the rest of the batch goes on
+            rejected = [job for job in jobs if job.cache_key == e.cache_key]
+            logger.warning(f"⚠ Feature extraction rejected images {[job.image_id for job in rejected]}: {e}")
+            await run_in_threadpool(self._fail, rejected, str(e), True, True)
+            rest = [job for job in jobs if job.cache_key != e.cache_key]
+            if rest:
+                await self._process(rest)
+            return
+        except Exception as e:
+            if len(jobs) > 1 and not isinstance(e, FeatureModelMismatch) and not is_outage(e):
+                # Probably one bad image; halve the batch until it is found, so only its job is charged
+                logger.debug(f"Feature batch of {len(jobs)} failed ({e}), retrying in halves")
+                await self._process(jobs[: len(jobs) // 2])
+                await self._process(jobs[len(jobs) // 2 :])
+                return
+            logger.warning(f"⚠ Feature extraction failed for images {[job.image_id for job in jobs]}: {e}")
+            await run_in_threadpool(self._fail, jobs, str(e))
+            return
+
+        if await self._store(jobs, vectors):
+            try:
+                await run_in_threadpool(self._cache_vectors, fresh)
+            except Exception as e:
+                logger.warning(f"⚠ Failed to cache feature vectors: {e}")
+
+    async def _extract(self, jobs: List[ClaimedJob]) -> Tuple[List[List[float]], Dict[str, List[float]]]:
+        """Vectors for ``jobs`` in order, plus the freshly extracted ones by content hash."""
+        cached = await run_in_threadpool(self._cached_vectors, jobs)
+        # One inference per distinct photo, however many jobs in the batch share it
+        todo: Dict[str, ClaimedJob] = {}
+        for job in jobs:
+            if job.cache_key not in cached:
+                todo.setdefault(job.cache_key, job)
+        fresh: Dict[str, List[float]] = {}
+        if todo:
+            contents = await run_in_threadpool(lambda: [job.path.read_bytes() for job in todo.values()])
+            try:
+                extracted = await extract_features_batch(contents)
+            except httpx.HTTPStatusError as e:
+                index = rejected_image_index(e)
+                if index is None or not 0 <= index < len(todo):
+                    raise
+                raise RejectedImage(list(todo)[index], e.response.text) from e
+            if extracted.model != settings.feature_model:
+                # Vectors from another model are not comparable; backfill_features.py handles switches
+                raise FeatureModelMismatch(
+                    f"ML service runs {extracted.model} but FEATURE_MODEL is {settings.feature_model}"
+                )
+            if len(extracted.vectors) != len(todo):
+                raise ValueError(f"ML service returned {len(extracted.vectors)} vectors for {len(todo)} images")
+            fresh = dict(zip(todo, extracted.vectors))
+        if cached:
+            logger.debug(f"Feature cache hit for {len(jobs) - len(todo)} of {len(jobs)} images")
+        vectors = [cached[job.cache_key] if job.cache_key in cached else fresh[job.cache_key] for job in jobs]
+        new_entries = {job.content_hash: fresh[job.cache_key] for job in todo.values() if job.content_hash}
+        return vectors, new_entries
+
+    async def _store(self, jobs: List[ClaimedJob], vectors: List[List[float]]) -> bool:
+        """Store the vectors, halving the batch on errors so one bad row (e.g. a deleted image) fails alone."""
+        try:
+            await run_in_threadpool(self._complete, jobs, vectors)
+            return True
+        except Exception as e:
+            if len(jobs) > 1:
+                logger.debug(f"Storing {len(jobs)} feature vectors failed ({e}), retrying in halves")
+                half = len(jobs) // 2
+                first = await self._store(jobs[:half], vectors[:half])
+                second = await self._store(jobs[half:], vectors[half:])
+                return first or second
+            logger.error(f"✗ Failed to store features for image {jobs[0].image_id}: {e}")
+            await run_in_threadpool(self._fail, jobs, str(e))
+            return False
+
+    def _cached_vectors(self, jobs: List[ClaimedJob]) -> Dict[str, List[float]]:
+        hashes = {job.content_hash for job in jobs if job.content_hash}
+        if not hashes:
+            return {}
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(FeatureCacheEntry.content_hash, FeatureCacheEntry.feature_vec)
+                .filter(FeatureCacheEntry.model_name == settings.feature_model, FeatureCacheEntry.content_hash.in_(hashes))
+                .all()
+            )
+            return {content_hash: vec for content_hash, vec in rows}
+        finally:
+            db.close()
+
+    def _cache_vectors(self, vectors: Dict[str, List[float]]) -> None:
+        if not vectors:
+            return
+        db = SessionLocal()
+        try:
+            for content_hash, vec in vectors.items():
+                db.add(
+                    FeatureCacheEntry(
+                        content_hash=content_hash, model_name=settings.feature_model, feature_dim=len(vec), feature_vec=vec
+                    )
+                )
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # Another worker cached the same photo first
+                    db.rollback()
+        finally:
+            db.close()
+
+    def _claim(self) -> List[ClaimedJob]:
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.stale_after)
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(FeatureJob, ItemImage.image_url, ItemImage.content_hash)
+                .join(ItemImage, ItemImage.id == FeatureJob.image_id)
+                .filter(
+                    or_(
+                        and_(FeatureJob.status == "pending", FeatureJob.run_after <= now),
+                        # A worker died mid-batch; pick its jobs back up
+                        and_(FeatureJob.status == "running", FeatureJob.updated_at < stale),
+                    )
+                )
+                .order_by(FeatureJob.id)
+                .limit(self.batch_size)
+                .with_for_update(of=FeatureJob, skip_locked=True)
+                .all()
+            )
+            claimed = []
+            for job, image_url, content_hash in rows:
+                job.status = "running"
+                job.attempts += 1
+                job.updated_at = now
+                path = Path(settings.static_dir) / Path(image_url).name
+                claimed.append(ClaimedJob(job.id, job.image_id, job.attempts, path, content_hash))
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _complete(self, jobs: List[ClaimedJob], vectors: List[List[float]]) -> None:
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            for job, vec in zip(jobs, vectors):
+                db.add(
+                    ImageFeature(
+                        image_id=job.image_id,
+                        model_name=settings.feature_model,
+                        feature_dim=len(vec),
+                        feature_vec=vec,
+                    )
+                )
+            job_ids = [job.job_id for job in jobs]
+            image_ids = [job.image_id for job in jobs]
+            db.query(FeatureJob).filter(FeatureJob.id.in_(job_ids)).update(
+                {"status": "done", "last_error": None, "updated_at": now}, synchronize_session=False
+            )
+            db.query(ItemImage).filter(ItemImage.id.in_(image_ids)).update(
+                {"feature_status": "done"}, synchronize_session=False
+            )
+            # Only open items take part in matching; closed ones keep their vectors for a reopen
+            image_items = {
+                image_id: (item_id, item_type)
+                for image_id, item_id, item_type in db.query(ItemImage.id, ItemImage.item_id, Item.type)
+                .join(Item, Item.id == ItemImage.item_id)
+                .filter(ItemImage.id.in_(image_ids), Item.status == "open")
+                .all()
+            }
+            db.commit()
+        finally:
+            db.close()
+        # Item responses embed each image's feature_status
+        response_cache.invalidate(ITEMS_NAMESPACE)
+        logger.info(f"✓ Stored features for {len(jobs)} images")
+
+        by_item: Dict[int, List[List[float]]] = defaultdict(list)
+        lost_items = set()
+        for job, vec in zip(jobs, vectors):
+            if job.image_id not in image_items:
+                continue
+            item_id, item_type = image_items[job.image_id]
+            if item_type == "found":
+                by_item[item_id].append(vec)
+            else:
+                lost_items.add(item_id)
+        for item_id, item_vectors in by_item.items():
+            try:
+                get_feature_store().add(item_id, item_vectors)
+            except Exception as e:
+                logger.warning(f"⚠ Failed to add found item {item_id} to feature store: {e}")
+        matches.features_stored(set(by_item), lost_items)
+
+    def _fail(self, jobs: List[ClaimedJob], error: str, charge_attempt: bool = True, give_up: bool = False) -> None:
+        now = datetime.utcnow()
+        gave_up = False
+        db = SessionLocal()
+        try:
+            for job in jobs:
+                values = {"last_error": error[:2000], "updated_at": now}
+                if not charge_attempt:
+                    values["status"] = "pending"
+                    values["attempts"] = job.attempts - 1
+                    values["run_after"] = now + timedelta(seconds=settings.ml_breaker_reset_seconds)
+                elif give_up or job.attempts >= self.max_attempts or not job.path.exists():
+                    values["status"] = "failed"
+                    gave_up = True
+                    db.query(ItemImage).filter(ItemImage.id == job.image_id).update(
+                        {"feature_status": "failed"}, synchronize_session=False
+                    )
+                else:
+                    values["status"] = "pending"
+                    values["run_after"] = now + timedelta(seconds=self.retry_backoff * 2 ** (job.attempts - 1))
+                db.query(FeatureJob).filter(FeatureJob.id == job.job_id).update(values, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        if gave_up:
+            response_cache.invalidate(ITEMS_NAMESPACE)
+
+
+feature_jobs = FeatureJobQueue(
+    workers=settings.feature_workers,
+    batch_size=settings.feature_batch_size,
+    max_attempts=settings.feature_job_max_attempts,
+    poll_interval=settings.feature_job_poll_seconds,
+    retry_backoff=settings.feature_job_retry_seconds,
+    stale_after=settings.feature_job_stale_seconds,
+)
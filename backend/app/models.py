@@ -1,9 +1,10 @@
 from datetime import datetime, date
 
-from sqlalchemy import Column, Integer, BigInteger, String, Text, Enum, Date, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Text, Enum, Date, DateTime, ForeignKey, Index, UniqueConstraint, DDL, event, text
 from sqlalchemy.orm import relationship
 
 from .database import Base
+from .db_types import Float32Vector
 
 
 class User(Base):
@@ -21,6 +22,13 @@ class User(Base):
 
 class Item(Base):
     __tablename__ = "items"
+    __table_args__ = (
+        # Keyset pagination in GET /items/ walks (created_at, id) newest first
+        Index("ix_items_created_at_id", "created_at", "id"),
+        # Match candidate filters in items/matches.py
+        Index("ix_items_type_status_category_created_at", "type", "status", "category", "created_at"),
+        Index("ix_items_type_status_location", "type", "status", "location"),
+    )
 
     id = Column(BigInteger, primary_key=True, index=True)
     user_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)
@@ -33,17 +41,58 @@ class Item(Base):
     status = Column(Enum("open", "matched", "closed", name="item_statuses"), default="open")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
+    # When this lost item's item_matches rows were last computed; NULL if never
+    matches_updated_at = Column(DateTime)
 
     user = relationship("User", back_populates="items")
     images = relationship("ItemImage", back_populates="item")
 
 
+# Native full-text index used by items/search.py. Postgres only uses the
+# expression index when a query repeats PG_SEARCH_DOCUMENT verbatim.
+FULLTEXT_INDEX_NAME = "ft_items_text"
+PG_SEARCH_DOCUMENT = (
+    "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, '') || ' ' || coalesce(category, ''))"
+)
+
+# Created with the items table; app/migrate.py adds them to an existing one
+FULLTEXT_INDEX_DDL = {
+    "postgresql": DDL(f"CREATE INDEX {FULLTEXT_INDEX_NAME} ON items USING GIN ({PG_SEARCH_DOCUMENT})"),
+    "mysql": DDL(f"CREATE FULLTEXT INDEX {FULLTEXT_INDEX_NAME} ON items (title, description, category)"),
+}
+# Catalog lookups for the index; the inspector does not reflect Postgres expression indexes
+FULLTEXT_INDEX_LOOKUP = {
+    "postgresql": "SELECT 1 FROM pg_indexes WHERE tablename = 'items' AND indexname = :name",
+    "mysql": (
+        "SELECT 1 FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = 'items' AND index_name = :name"
+    ),
+}
+
+for _dialect, _ddl in FULLTEXT_INDEX_DDL.items():
+    event.listen(Item.__table__, "after_create", _ddl.execute_if(dialect=_dialect))
+
+
+def fulltext_index_exists(conn, dialect: str) -> bool:
+    """Whether ``ft_items_text`` exists; ``conn`` is a Connection or Session of that dialect."""
+    sql = FULLTEXT_INDEX_LOOKUP.get(dialect)
+    return sql is not None and conn.execute(text(sql), {"name": FULLTEXT_INDEX_NAME}).first() is not None
+
+
 class ItemImage(Base):
     __tablename__ = "item_images"
 
     id = Column(BigInteger, primary_key=True, index=True)
     item_id = Column(BigInteger, ForeignKey("items.id", ondelete="CASCADE"), nullable=False)
     image_url = Column(String(512), nullable=False)
+    # sha256 of the uploaded bytes; also the stored file's name
+    content_hash = Column(String(64), index=True)
+    # Resized WebP derivatives (see items/derivatives.py); NULL for images uploaded before they existed
+    thumbnail_url = Column(String(512))
+    medium_url = Column(String(512))
+    feature_status = Column(
+        Enum("pending", "done", "failed", name="feature_statuses"), nullable=False, default="pending"
+    )
     created_at = Column(DateTime, default=datetime.utcnow)
 
     item = relationship("Item", back_populates="images")
@@ -57,7 +106,49 @@ class ImageFeature(Base):
     image_id = Column(BigInteger, ForeignKey("item_images.id", ondelete="CASCADE"), nullable=False)
     model_name = Column(String(100), nullable=False)
     feature_dim = Column(Integer, nullable=False)
-    feature_vec = Column(String, nullable=False)  # serialized vector (e.g., JSON); adjust to BLOB if needed
+    feature_vec = Column(Float32Vector, nullable=False)  # raw little-endian float32, feature_dim values
     created_at = Column(DateTime, default=datetime.utcnow)
 
     image = relationship("ItemImage", back_populates="features")
+
+
+class FeatureCacheEntry(Base):
+    """Feature vector per distinct image content, so re-uploaded photos skip inference."""
+
+    __tablename__ = "feature_cache"
+    __table_args__ = (UniqueConstraint("content_hash", "model_name", name="uq_feature_cache_hash_model"),)
+
+    id = Column(BigInteger, primary_key=True, index=True)
+    content_hash = Column(String(64), nullable=False)  # ItemImage.content_hash
+    model_name = Column(String(100), nullable=False)
+    feature_dim = Column(Integer, nullable=False)
+    feature_vec = Column(Float32Vector, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ItemMatch(Base):
+    """One of a lost item's top-k found items, maintained by items/matches.py."""
+
+    __tablename__ = "item_matches"
+    __table_args__ = (Index("ix_item_matches_lost_score", "lost_item_id", "score"),)
+
+    lost_item_id = Column(BigInteger, ForeignKey("items.id", ondelete="CASCADE"), primary_key=True)
+    found_item_id = Column(BigInteger, ForeignKey("items.id", ondelete="CASCADE"), primary_key=True, index=True)
+    score = Column(Float, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class FeatureJob(Base):
+    __tablename__ = "feature_jobs"
+    __table_args__ = (Index("ix_feature_jobs_status_run_after", "status", "run_after"),)
+
+    id = Column(BigInteger, primary_key=True, index=True)
+    image_id = Column(BigInteger, ForeignKey("item_images.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(
+        Enum("pending", "running", "done", "failed", name="feature_job_statuses"), nullable=False, default="pending"
+    )
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    run_after = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
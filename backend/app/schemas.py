@@ -59,6 +59,9 @@ class ItemOut(ItemBase):
 class ItemImageOut(BaseModel):
     id: int
     image_url: str
+    thumbnail_url: Optional[str] = None
+    medium_url: Optional[str] = None
+    feature_status: str
 
     class Config:
         orm_mode = True
@@ -68,6 +71,17 @@ class ItemDetail(ItemOut):
     images: List[ItemImageOut] = []
 
 
+class ImageFeatureStatus(BaseModel):
+    image_id: int
+    feature_status: str
+
+
+class ItemFeatureStatus(BaseModel):
+    item_id: int
+    status: str  # "done" once every image has features, "pending" while any is queued
+    images: List[ImageFeatureStatus] = []
+
+
 class MatchResult(BaseModel):
     item_id: int
     score: float
@@ -0,0 +1,298 @@
+"""
+Compute missing image features with the ML service
+Safe to stop and re-run: only images without a vector for the target model
+are sent, and progress is checkpointed to a file after every batch.
+
+    python backfill_features.py [--model yolov8n] [--batch-size 16] [--concurrency 4]
+
+Uses ML_SERVICE_URL like the backend. Typical uses:
+
+- images whose extraction failed or never ran: run with no options
+- vectors stored under another model's name: ``--relabel OLD_MODEL``
+  (``python -m app.migrate`` already renames the "yolov11n" rows of older
+  versions to yolov8n, the model that computed them)
+- switching models without downtime: start an ML service with the new
+  ``YOLO_WEIGHTS``, point ML_SERVICE_URL at it and run with ``--model <new>``
+  while the site keeps matching with the old vectors. Then switch the ML
+  service and ``FEATURE_MODEL`` together, and run once more to pick up
+  images uploaded in between. Runs for the active model rebuild the feature
+  store and reset match lists, so matching moves over to the new vectors.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import logging
+import time
+from collections import deque
+from pathlib import Path
+from typing import Deque, List, Optional, Tuple
+
+# Add the backend directory to the path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import exists, insert, select
+
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.items import matches
+from app.ml import client
+from app.migrate import relabel_vectors
+from app.models import FeatureCacheEntry, FeatureJob, ImageFeature, ItemImage
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REPORT_EVERY_SECONDS = 10
+
+
+class ModelMismatch(Exception):
+    """The ML service reports a different model than the one being backfilled."""
+
+
+class Checkpoint:
+    """Highest image id below which every image has been handled, kept in a small JSON file."""
+
+    def __init__(self, path: Path, model: str):
+        self.path = path
+        self.model = model
+        self.last_image_id = 0
+
+    def load(self) -> None:
+        if not self.path.exists():
+            return
+        data = json.loads(self.path.read_text())
+        if data.get("model") == self.model:
+            self.last_image_id = int(data["last_image_id"])
+
+    def save(self, last_image_id: int) -> None:
+        self.last_image_id = last_image_id
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"model": self.model, "last_image_id": last_image_id}))
+        os.replace(tmp, self.path)
+
+
+def relabel(old_model: str, model: str) -> None:
+    """Rename vectors stored under ``old_model`` to ``model``."""
+    with engine.begin() as conn:
+        feature_rows, cache_rows = relabel_vectors(conn, old_model, model)
+    logger.info(f"✓ Relabelled {feature_rows} feature rows and {cache_rows} cache rows from {old_model} to {model}")
+
+
+def cached_vectors(model: str, hashes: List[str]) -> dict:
+    if not hashes:
+        return {}
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(FeatureCacheEntry.content_hash, FeatureCacheEntry.feature_vec)
+            .filter(FeatureCacheEntry.model_name == model, FeatureCacheEntry.content_hash.in_(hashes))
+            .all()
+        )
+        return {content_hash: vec for content_hash, vec in rows}
+    finally:
+        db.close()
+
+
+def store_vectors(model: str, rows: List[Tuple[int, Optional[str], list]], new_cache: dict) -> None:
+    """Bulk-insert one batch of vectors in a single transaction."""
+    db = SessionLocal()
+    try:
+        db.execute(
+            insert(ImageFeature),
+            [
+                {"image_id": image_id, "model_name": model, "feature_dim": len(vec), "feature_vec": vec}
+                for image_id, _, vec in rows
+            ],
+        )
+        if new_cache:
+            # Skip photos that another process cached in the meantime
+            known = set(cached_vectors(model, list(new_cache)))
+            entries = [
+                {"content_hash": content_hash, "model_name": model, "feature_dim": len(vec), "feature_vec": vec}
+                for content_hash, vec in new_cache.items()
+                if content_hash not in known
+            ]
+            if entries:
+                db.execute(insert(FeatureCacheEntry), entries)
+        if model == settings.feature_model:
+            image_ids = [image_id for image_id, _, _ in rows]
+            db.query(ItemImage).filter(ItemImage.id.in_(image_ids)).update(
+                {"feature_status": "done"}, synchronize_session=False
+            )
+            db.query(FeatureJob).filter(FeatureJob.image_id.in_(image_ids), FeatureJob.status != "done").update(
+                {"status": "done", "last_error": None}, synchronize_session=False
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+class Backfill:
+    def __init__(self, model: str, batch_size: int, concurrency: int, checkpoint: Checkpoint):
+        self.model = model
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.checkpoint = checkpoint
+        self.static_dir = Path(settings.static_dir)
+        self.scanned = self.written = self.cached = self.missing = self.failed = 0
+        self.started = self.reported = time.perf_counter()
+
+    def _pending_images(self):
+        """Images after the checkpoint with no vector for the model, streamed with a server-side cursor."""
+        has_vector = exists().where(ImageFeature.image_id == ItemImage.id, ImageFeature.model_name == self.model)
+        return (
+            select(ItemImage.id, ItemImage.image_url, ItemImage.content_hash)
+            .where(ItemImage.id > self.checkpoint.last_image_id, ~has_vector)
+            .order_by(ItemImage.id)
+        )
+
+    async def _process(self, batch) -> None:
+        cached = await asyncio.to_thread(
+            cached_vectors, self.model, list({row.content_hash for row in batch if row.content_hash})
+        )
+        rows: List[Tuple[int, Optional[str], list]] = []
+        todo = []
+        for row in batch:
+            if row.content_hash in cached:
+                rows.append((row.id, row.content_hash, cached[row.content_hash]))
+                continue
+            path = self.static_dir / Path(row.image_url).name
+            if not path.exists():
+                logger.warning(f"⚠ Image file missing for image {row.id}: {path}")
+                self.missing += 1
+                continue
+            todo.append((row, path))
+
+        new_cache = {}
+        if todo:
+            contents = await asyncio.to_thread(lambda: [path.read_bytes() for _, path in todo])
+            extracted = await client.extract_features_batch(contents)
+            if extracted.model != self.model:
+                raise ModelMismatch(f"ML service runs {extracted.model}, not {self.model}; check ML_SERVICE_URL")
+            for (row, _), vec in zip(todo, extracted.vectors):
+                rows.append((row.id, row.content_hash, vec))
+                if row.content_hash:
+                    new_cache[row.content_hash] = vec
+
+        if rows:
+            await asyncio.to_thread(store_vectors, self.model, rows, new_cache)
+        self.written += len(rows)
+        self.cached += len(rows) - len(todo)
+
+    def _report(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        rate = self.written / elapsed if elapsed else 0.0
+        logger.info(
+            f"Scanned {self.scanned}, stored {self.written} ({self.cached} from cache), "
+            f"missing files {self.missing}, failed batches {self.failed} - {rate:.1f} images/s, "
+            f"checkpoint at image {self.checkpoint.last_image_id}"
+        )
+        self.reported = time.perf_counter()
+
+    async def run(self) -> None:
+        # (last image id of the batch, task) in id order; the checkpoint only moves past finished batches
+        inflight: Deque[Tuple[int, asyncio.Task]] = deque()
+        blocked = False  # a failed batch holds the checkpoint back so the next run retries it
+
+        def advance() -> None:
+            nonlocal blocked
+            last_done = None
+            while inflight and inflight[0][1].done():
+                last_id, task = inflight.popleft()
+                error = task.exception()
+                if isinstance(error, (ModelMismatch, client.MLServiceUnavailable)):
+                    raise error
+                if error is not None:
+                    logger.warning(f"⚠ Batch up to image {last_id} failed: {error}")
+                    self.failed += 1
+                    blocked = True
+                elif not blocked:
+                    last_done = last_id
+            if last_done is not None:
+                self.checkpoint.save(last_done)
+
+        try:
+            with engine.connect() as conn:
+                result = conn.execution_options(
+                    stream_results=True, yield_per=self.batch_size * self.concurrency
+                ).execute(self._pending_images())
+                for batch in result.partitions(self.batch_size):
+                    self.scanned += len(batch)
+                    inflight.append((batch[-1].id, asyncio.create_task(self._process(batch))))
+                    running = [task for _, task in inflight if not task.done()]
+                    if len(running) >= self.concurrency:
+                        await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    advance()
+                    if time.perf_counter() - self.reported >= REPORT_EVERY_SECONDS:
+                        self._report()
+            if inflight:
+                await asyncio.wait([task for _, task in inflight])
+            advance()
+        finally:
+            for _, task in inflight:
+                task.cancel()
+            self._report()
+
+
+async def backfill(args) -> int:
+    checkpoint = Checkpoint(Path(args.checkpoint or f"backfill_features.{args.model}.json"), args.model)
+    if not args.restart:
+        checkpoint.load()
+    if checkpoint.last_image_id:
+        logger.info(f"Resuming after image {checkpoint.last_image_id}")
+
+    job = Backfill(args.model, args.batch_size, args.concurrency, checkpoint)
+    try:
+        await job.run()
+    finally:
+        await client.close()
+    return job.written
+
+
+def refresh_matching() -> None:
+    """Point matching at the active model's current vectors."""
+    db = SessionLocal()
+    try:
+        dropped = matches.rebuild_all(db)
+        logger.info(f"✓ Rebuilt the feature store and dropped {dropped} stored matches; lists recompute on read")
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.feature_model, help="model name the ML service must report")
+    parser.add_argument("--batch-size", type=int, default=16, help="images per ML request")
+    parser.add_argument("--concurrency", type=int, default=4, help="ML requests in flight")
+    parser.add_argument("--checkpoint", help="progress file (default backfill_features.<model>.json)")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and rescan every image")
+    parser.add_argument("--relabel", metavar="OLD_MODEL", help="first rename vectors stored under OLD_MODEL")
+    parser.add_argument(
+        "--refresh-matches", action="store_true", help="rebuild matching data even if nothing was backfilled"
+    )
+    args = parser.parse_args()
+
+    logger.info("=" * 80)
+    logger.info(f"Backfilling image features for model {args.model}")
+    logger.info("=" * 80)
+
+    try:
+        if args.relabel:
+            relabel(args.relabel, args.model)
+        written = asyncio.run(backfill(args))
+        if args.model == settings.feature_model and (written or args.relabel or args.refresh_matches):
+            refresh_matching()
+    except (ModelMismatch, client.MLServiceUnavailable) as e:
+        # Progress up to here is checkpointed; fix the service and re-run
+        logger.error(f"✗ Backfill stopped: {e}")
+        sys.exit(1)
+    except Exception as e:
+        logger.error(f"✗ Backfill failed: {e}", exc_info=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,9 @@ from pathlib import Path
 # Add the backend directory to the path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from app.database import SessionLocal, engine
-from app.models import Base, User
+from app.database import SessionLocal
+from app.migrate import migrate
+from app.models import User
 from app.auth.utils import hash_password
 
 # Configure logging
@@ -22,9 +23,9 @@ logger.info("Initializing Database with Test User")
 logger.info("=" * 80)
 
 try:
-    # Create all tables
-    logger.info("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    # Create or update tables
+    logger.info("Migrating database schema...")
+    migrate()
     logger.info("✓ Database tables created/verified")
     
     # Create a database session
@@ -0,0 +1,122 @@
+"""
+Rewrite legacy JSON feature vectors as raw float32
+Run this script once after upgrading; it is safe to re-run and skips rows
+that are already binary.
+
+    python migrate_feature_vectors.py [--batch-size 500] [--dry-run]
+"""
+import argparse
+import sys
+import logging
+import time
+from pathlib import Path
+
+# Add the backend directory to the path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import LargeBinary, bindparam, column, inspect, select, text
+
+from app.database import SessionLocal, engine
+from app.db_types import decode_vector, is_legacy_vector
+from app.models import ImageFeature
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TABLE = ImageFeature.__table__
+
+
+def ensure_binary_column() -> None:
+    """Switch ``feature_vec`` to a binary column where the database still has text."""
+    column = next(c for c in inspect(engine).get_columns(TABLE.name) if c["name"] == "feature_vec")
+    if isinstance(column["type"], LargeBinary):
+        logger.info(f"✓ feature_vec is already binary ({column['type']})")
+        return
+
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        ddl = "ALTER TABLE image_features ALTER COLUMN feature_vec TYPE BYTEA USING convert_to(feature_vec, 'UTF8')"
+    elif dialect == "mysql":
+        ddl = "ALTER TABLE image_features MODIFY feature_vec BLOB NOT NULL"
+    else:
+        # SQLite stores whatever it is given; the rows are rewritten below
+        logger.info(f"No column type change needed on {dialect}")
+        return
+
+    logger.info(f"Altering feature_vec column: {ddl}")
+    with engine.begin() as conn:
+        conn.execute(text(ddl))
+    logger.info("✓ feature_vec column is now binary")
+
+
+def migrate_rows(batch_size: int, dry_run: bool) -> int:
+    """Rewrite JSON rows in id order, one transaction per batch."""
+    # Untyped column: read the driver's raw value instead of decoding it
+    raw_vec = column("feature_vec").label("raw_vec")
+    update_stmt = (
+        TABLE.update()
+        .where(TABLE.c.id == bindparam("row_id"))
+        .values(feature_vec=bindparam("vec"), feature_dim=bindparam("dim"))
+    )
+
+    db = SessionLocal()
+    last_id = 0
+    scanned = converted = 0
+    started = time.perf_counter()
+    try:
+        while True:
+            rows = db.execute(
+                select(TABLE.c.id, raw_vec)
+                .select_from(TABLE)
+                .where(TABLE.c.id > last_id)
+                .order_by(TABLE.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            scanned += len(rows)
+
+            params = []
+            for row in rows:
+                raw = bytes(row.raw_vec) if isinstance(row.raw_vec, memoryview) else row.raw_vec
+                if not is_legacy_vector(raw):
+                    continue
+                vec = decode_vector(raw)
+                params.append({"row_id": row.id, "vec": vec, "dim": int(vec.size)})
+
+            if params and not dry_run:
+                db.execute(update_stmt, params)
+                db.commit()
+            converted += len(params)
+            logger.info(f"Scanned {scanned} rows (up to id {last_id}), converted {converted}")
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"✓ Converted {converted} of {scanned} rows in {elapsed:.1f}s" + (" (dry run)" if dry_run else ""))
+    return converted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+
+    logger.info("=" * 80)
+    logger.info("Migrating image_features.feature_vec to float32 binary")
+    logger.info("=" * 80)
+
+    try:
+        if not args.dry_run:
+            ensure_binary_column()
+        migrate_rows(args.batch_size, args.dry_run)
+    except Exception as e:
+        logger.error(f"✗ Migration failed: {e}", exc_info=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import axiosClient from './axiosClient';
+
+// GET /items returns one page at a time; the X-Next-Cursor header points at the next page until the last one
+export const PAGE_SIZE = 50;
+
+export interface ItemPage<T> {
+  items: T[];
+  nextCursor?: string;
+}
+
+export async function fetchItemsPage<T>(
+  params: Record<string, string | undefined> = {},
+  fields: string[] = [],
+  cursor?: string,
+): Promise<ItemPage<T>> {
+  const res = await axiosClient.get<T[]>('/items', {
+    params: { ...params, limit: PAGE_SIZE, cursor, fields: fields.length ? fields.join(',') : undefined },
+  });
+  const next = res.headers['x-next-cursor'];
+  return { items: res.data, nextCursor: typeof next === 'string' && next ? next : undefined };
+}
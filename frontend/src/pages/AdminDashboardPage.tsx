@@ -1,5 +1,6 @@
 import { useEffect, useState } from 'react';
 import axiosClient from '../api/axiosClient';
+import { fetchItemsPage } from '../api/items';
 import { useNavigate } from 'react-router-dom';
 
 interface Item {
@@ -10,18 +11,22 @@ interface Item {
   location?: string;
 }
 
+const LIST_FIELDS = ['id', 'title', 'type', 'status', 'location'];
+
 function AdminDashboardPage() {
   const [items, setItems] = useState<Item[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | undefined>();
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const navigate = useNavigate();
 
-  const fetchItems = async () => {
+  const fetchItems = async (cursor?: string) => {
     setLoading(true);
     setError(null);
     try {
-      const res = await axiosClient.get('/items');
-      setItems(res.data);
+      const page = await fetchItemsPage<Item>({}, LIST_FIELDS, cursor);
+      setItems((prev) => (cursor ? [...prev, ...page.items] : page.items));
+      setNextCursor(page.nextCursor);
     } catch (err: any) {
       setError(err.response?.data?.detail ?? 'Failed to load items');
     } finally {
@@ -85,6 +90,11 @@ function AdminDashboardPage() {
           )}
         </tbody>
       </table>
+      {nextCursor && (
+        <button type="button" onClick={() => fetchItems(nextCursor)} disabled={loading}>
+          Load more
+        </button>
+      )}
     </main>
   );
 }
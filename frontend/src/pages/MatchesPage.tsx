@@ -1,5 +1,6 @@
 import { useEffect, useState } from 'react';
 import axiosClient from '../api/axiosClient';
+import { fetchItemsPage } from '../api/items';
 import { useNavigate } from 'react-router-dom';
 
 interface Item {
@@ -8,7 +9,7 @@ interface Item {
   description?: string;
   location?: string;
   type: 'lost' | 'found';
-  images?: { id: number; image_url: string }[];
+  images?: { id: number; image_url: string; thumbnail_url?: string | null }[];
 }
 
 interface MatchResult {
@@ -16,23 +17,28 @@ interface MatchResult {
   score: number;
 }
 
+const LOST_ITEM_FIELDS = ['id', 'title'];
+
 function MatchesPage() {
   const [lostItems, setLostItems] = useState<Item[]>([]);
+  const [lostCursor, setLostCursor] = useState<string | undefined>();
   const [selectedLostId, setSelectedLostId] = useState<number | ''>('');
   const [matches, setMatches] = useState<(MatchResult & { item: Item | null })[]>([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const navigate = useNavigate();
 
+  const loadLostItems = async (cursor?: string) => {
+    try {
+      const page = await fetchItemsPage<Item>({ type: 'lost' }, LOST_ITEM_FIELDS, cursor);
+      setLostItems((prev) => (cursor ? [...prev, ...page.items] : page.items));
+      setLostCursor(page.nextCursor);
+    } catch (err: any) {
+      setError(err.response?.data?.detail ?? 'Failed to load lost items');
+    }
+  };
+
   useEffect(() => {
-    const loadLostItems = async () => {
-      try {
-        const res = await axiosClient.get<Item[]>('/items', { params: { type: 'lost' } });
-        setLostItems(res.data);
-      } catch (err: any) {
-        setError(err.response?.data?.detail ?? 'Failed to load lost items');
-      }
-    };
     loadLostItems();
   }, []);
 
@@ -88,6 +94,11 @@ function MatchesPage() {
         <button type="button" onClick={fetchMatches} disabled={!selectedLostId || loading}>
           View Matches
         </button>
+        {lostCursor && (
+          <button type="button" onClick={() => loadLostItems(lostCursor)}>
+            Load more lost items
+          </button>
+        )}
       </div>
       {loading && <p>Loading...</p>}
       {error && <p style={{ color: 'red' }}>{error}</p>}
@@ -104,7 +115,7 @@ function MatchesPage() {
                 </p>
                   {m.item.images && m.item.images.length > 0 && (
                     <img
-                      src={`${import.meta.env.VITE_API_URL}${m.item.images[0].image_url}`}
+                      src={`${import.meta.env.VITE_API_URL}${m.item.images[0].thumbnail_url ?? m.item.images[0].image_url}`}
                       alt={m.item.title}
                     style={{ maxWidth: '200px', display: 'block', marginBottom: '0.5rem' }}
                   />
@@ -1,19 +1,23 @@
 import { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-import axiosClient from '../api/axiosClient';
+import { fetchItemsPage } from '../api/items';
 
 interface Item {
   id: number;
   title: string;
-  description?: string;
   location?: string;
   type: 'lost' | 'found';
   status: string;
-  images?: { id: number; image_url: string }[];
+  images?: { id: number; image_url: string; thumbnail_url?: string | null }[];
 }
 
+const LIST_FIELDS = ['id', 'title', 'type', 'status', 'location', 'images'];
+
 function SearchItemsPage() {
   const [items, setItems] = useState<Item[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | undefined>();
+  // Filters of the current result list, so "Load more" continues the same query
+  const [appliedFilters, setAppliedFilters] = useState<Record<string, string | undefined>>({});
   const [type, setType] = useState<string>('');
   const [name, setName] = useState<string>('');
   const [location, setLocation] = useState<string>('');
@@ -21,18 +25,14 @@ function SearchItemsPage() {
   const [error, setError] = useState<string | null>(null);
   const navigate = useNavigate();
 
-  const fetchItems = async () => {
+  const fetchItems = async (filters: Record<string, string | undefined>, cursor?: string) => {
     setLoading(true);
     setError(null);
     try {
-      const res = await axiosClient.get('/items', {
-        params: {
-          type: type || undefined,
-          name: name || undefined,
-          location: location || undefined,
-        },
-      });
-      setItems(res.data);
+      const page = await fetchItemsPage<Item>(filters, LIST_FIELDS, cursor);
+      setAppliedFilters(filters);
+      setItems((prev) => (cursor ? [...prev, ...page.items] : page.items));
+      setNextCursor(page.nextCursor);
     } catch (err: any) {
       setError(err.response?.data?.detail ?? 'Failed to load items');
     } finally {
@@ -42,7 +42,11 @@ function SearchItemsPage() {
 
   const handleSearch = (e: React.FormEvent) => {
     e.preventDefault();
-    fetchItems();
+    fetchItems({
+      type: type || undefined,
+      name: name || undefined,
+      location: location || undefined,
+    });
   };
 
   return (
@@ -79,12 +83,11 @@ function SearchItemsPage() {
             </h3>
             {item.images && item.images.length > 0 && (
               <img
-                src={`${import.meta.env.VITE_API_URL}${item.images[0].image_url}`}
+                src={`${import.meta.env.VITE_API_URL}${item.images[0].thumbnail_url ?? item.images[0].image_url}`}
                 alt={item.title}
                 style={{ maxWidth: '200px', display: 'block', marginBottom: '0.5rem' }}
               />
             )}
-            {item.description && <p>{item.description}</p>}
             <p>
               <strong>Location:</strong> {item.location || 'N/A'}
             </p>
@@ -95,6 +98,11 @@ function SearchItemsPage() {
         ))}
         {!loading && !error && items.length === 0 && <p>No items found.</p>}
       </ul>
+      {nextCursor && (
+        <button type="button" onClick={() => fetchItems(appliedFilters, nextCursor)} disabled={loading}>
+          Load more
+        </button>
+      )}
     </main>
   );
 }
@@ -0,0 +1,117 @@
+"""Coalesce concurrent feature extractions into batched YOLO calls.
+
+Requests put their image on a queue and wait on a future. Each of
+``concurrency`` runner tasks (one per inference worker) takes the first
+waiting image, keeps collecting until ``max_batch_size`` images are queued
+or ``max_wait`` seconds have passed, runs one batched forward pass through
+``runner`` and hands each request its own vector.
+While a batch is running the next one fills up, so under load the batch size
+grows with concurrency instead of the number of forward passes. At most
+``max_pending`` images wait; beyond that ``submit`` raises ``BatcherOverloaded``.
+"""
+import asyncio
+import logging
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BatcherOverloaded(Exception):
+    """Raised when ``max_pending`` images are already waiting for inference."""
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], List[Any]],
+        runner: Callable[..., Awaitable[Any]],
+        max_batch_size: int,
+        max_wait: float,
+        max_pending: int,
+        concurrency: int = 1,
+    ):
+        self.fn = fn
+        self.runner = runner
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.concurrency = concurrency
+        self.rejected = 0
+        self._queue: Optional["asyncio.Queue[Tuple[Any, asyncio.Future]]"] = None
+        self._tasks: List[asyncio.Task] = []
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes: Counter = Counter()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+        logger.info(f"✓ Micro-batcher started (max batch {self.max_batch_size}, max wait {self.max_wait * 1000:.0f}ms)")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, item: Any) -> Any:
+        if self._queue is None:
+            raise RuntimeError("Micro-batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise BatcherOverloaded(f"{self.max_pending} images already waiting for inference")
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Requests whose client went away no longer need a result
+        return [(item, future) for item, future in batch if not future.cancelled()]
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_sizes[len(batch)] += 1
+            try:
+                results = await self.runner(self.fn, [item for item, _ in batch])
+            except Exception as e:
+                logger.error(f"✗ Batch of {len(batch)} failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "images": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "batch_size_histogram": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
@@ -0,0 +1,88 @@
+"""Where YOLO inference runs, and with how many torch threads.
+
+Inference never runs on the event loop. With ``ML_INFERENCE_EXECUTOR=thread``
+(the default) every batch runs on one dedicated thread; the YOLO predictor
+is not safe to call from several threads at once and torch already spreads
+one forward pass over ``TORCH_NUM_THREADS`` cores. ``process`` forks
+``ML_INFERENCE_WORKERS`` child processes instead, each running whole
+batches; they inherit the already-loaded weights copy-on-write and warm up
+when they start.
+
+Setting the torch thread counts explicitly keeps ``gunicorn -w N`` workers
+from each assuming they own every core.
+"""
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_EXECUTOR = os.getenv("ML_INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS = int(os.getenv("ML_INFERENCE_WORKERS", "1"))
+# 0 keeps torch's own default
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+TORCH_INTEROP_THREADS = int(os.getenv("TORCH_INTEROP_THREADS", "0"))
+# Load weights at import so `gunicorn --preload` shares them between workers
+PRELOAD_MODEL = os.getenv("ML_PRELOAD_MODEL", "true").lower() in ("1", "true", "yes")
+
+
+def configure_torch() -> None:
+    if TORCH_NUM_THREADS > 0:
+        torch.set_num_threads(TORCH_NUM_THREADS)
+    if TORCH_INTEROP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(TORCH_INTEROP_THREADS)
+        except RuntimeError as e:
+            # Only allowed once per process, before any parallel work
+            logger.debug(f"Inter-op threads already fixed: {e}")
+    logger.info(
+        f"✓ Torch using {torch.get_num_threads()} intra-op and {torch.get_num_interop_threads()} inter-op threads"
+    )
+
+
+def _init_process() -> None:
+    from .model import warmup
+
+    configure_torch()
+    warmup()
+
+
+class InferenceExecutor:
+    def __init__(self, kind: str, workers: int):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"ML_INFERENCE_EXECUTOR must be 'thread' or 'process', got {kind!r}")
+        self.kind = kind
+        self.workers = workers if kind == "process" else 1
+        self._executor: Optional[Executor] = None
+
+    def start(self) -> None:
+        if self._executor is not None:
+            return
+        if self.kind == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_process,
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        logger.info(f"✓ Inference executor started ({self.kind}, {self.workers} workers)")
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        if self._executor is None:
+            raise RuntimeError("Inference executor is not running")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(fn, *args))
+
+
+inference_executor = InferenceExecutor(INFERENCE_EXECUTOR, INFERENCE_WORKERS)
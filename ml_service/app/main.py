@@ -1,19 +1,91 @@
-from typing import List
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
 import numpy as np
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from PIL import Image
+from starlette.concurrency import run_in_threadpool
 
-from .model import extract_features
+from .batcher import BatcherOverloaded, MicroBatcher
+from .inference import PRELOAD_MODEL, configure_torch, inference_executor
+from .model import MODEL_NAME, extract_features_batch, get_yolo_model, warmup
+from .preprocess import InvalidImage, load_image
+from .similarity import decode_array, top_matches
 
-app = FastAPI(title="ML Feature Service")
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Concurrent extractions are merged into one forward pass of up to this many images
+MAX_BATCH_SIZE = int(os.getenv("ML_MAX_BATCH_SIZE", "16"))
+MAX_BATCH_WAIT_MS = float(os.getenv("ML_MAX_BATCH_WAIT_MS", "10"))
+# Images allowed to wait for inference before requests are turned away with 503
+MAX_PENDING = int(os.getenv("ML_MAX_PENDING", "64"))
+
+configure_torch()
+if PRELOAD_MODEL:
+    # Under `gunicorn --preload` this runs once in the master and workers share the weights
+    start = time.perf_counter()
+    get_yolo_model()
+    logger.info(f"✓ YOLO model {MODEL_NAME} preloaded in {time.perf_counter() - start:.2f}s")
+
+batcher = MicroBatcher(
+    extract_features_batch,
+    inference_executor.run,
+    MAX_BATCH_SIZE,
+    MAX_BATCH_WAIT_MS / 1000,
+    MAX_PENDING,
+    concurrency=inference_executor.workers,
+)
+
+# Reported by /ready; "warming_up" until the model has served its first inference
+readiness = {"status": "warming_up", "model": MODEL_NAME, "timings": {}, "error": None}
+
+
+async def _warm_up() -> None:
+    start = time.perf_counter()
+    try:
+        timings = await inference_executor.run(warmup)
+    except Exception as e:
+        logger.error(f"✗ Model warmup failed: {e}")
+        readiness.update(status="failed", error=str(e))
+        return
+    timings["total"] = time.perf_counter() - start
+    readiness.update(status="ready", timings=timings)
+    logger.info(f"✓ ML service ready in {timings['total']:.2f}s")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    inference_executor.start()
+    # Warm up in the background so liveness checks answer while the model loads
+    task = asyncio.create_task(_warm_up())
+    batcher.start()
+    yield
+    task.cancel()
+    await batcher.stop()
+    inference_executor.shutdown()
+
+
+app = FastAPI(title="ML Feature Service", lifespan=lifespan)
+
+
+@app.exception_handler(BatcherOverloaded)
+async def overloaded_handler(request, exc: BatcherOverloaded):
+    logger.warning(f"⚠ Rejecting {request.url.path}: {exc}")
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
 
 
 class CompareRequest(BaseModel):
     query_vector: List[float]
     candidate_vectors: List[List[float]]
     candidate_ids: List[int]
+    top_k: Optional[int] = None
+    min_score: Optional[float] = None
 
 
 @app.get("/")
@@ -21,22 +93,73 @@ async def root():
     return {"message": "ML service running"}
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until the model is loaded and warmed up."""
+    status_code = 200 if readiness["status"] == "ready" else 503
+    return JSONResponse(readiness, status_code=status_code)
+
+
+@app.get("/metrics")
+async def metrics():
+    return {"batcher": batcher.metrics()}
+
+
+async def _decode(image: UploadFile, index: int):
+    """Decode one upload; an undecodable one is a 422 naming its position in the request."""
+    try:
+        return await run_in_threadpool(load_image, image.file)
+    except InvalidImage as e:
+        logger.warning(f"⚠ Rejecting image {index} ({image.filename}): {e}")
+        raise HTTPException(status_code=422, detail={"message": str(e), "index": index})
+
+
 @app.post("/features/extract")
 async def features_extract(image: UploadFile = File(...)):
-    img = Image.open(image.file).convert("RGB")
-    vec = extract_features(img)
-    return {"vector": vec.tolist()}
+    img = await _decode(image, 0)
+    vec = await batcher.submit(img)
+    return {"vector": vec.tolist(), "model": MODEL_NAME}
+
+
+@app.post("/features/extract_batch")
+async def features_extract_batch(images: List[UploadFile] = File(...)):
+    imgs = [await _decode(image, index) for index, image in enumerate(images)]
+    # Goes through the batcher too, so these images share passes with concurrent requests
+    vecs = await asyncio.gather(*(batcher.submit(img) for img in imgs))
+    return {"vectors": [vec.tolist() for vec in vecs], "model": MODEL_NAME}
 
 
 @app.post("/features/compare")
 async def features_compare(req: CompareRequest):
-    q = np.array(req.query_vector, dtype=np.float32)
-    candidates = np.array(req.candidate_vectors, dtype=np.float32)
-    # cosine similarity
-    scores = np.dot(candidates, q)  # assuming vectors are normalized
-    order = np.argsort(scores)[::-1]
-    results = [
-        {"item_id": int(req.candidate_ids[i]), "score": float(scores[i])}
-        for i in order
-    ]
+    try:
+        q = np.array(req.query_vector, dtype=np.float32)
+        # Raises ValueError when the candidates' dimension differs from the query's
+        candidates = np.array(req.candidate_vectors, dtype=np.float32).reshape(-1, q.shape[0])
+        # cosine similarity, assuming vectors are normalized
+        results = top_matches(q, candidates, np.array(req.candidate_ids), req.top_k, req.min_score)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"results": results}
+
+
+@app.post("/features/compare_binary")
+async def features_compare_binary(
+    query: UploadFile = File(...),
+    candidates: UploadFile = File(...),
+    candidate_ids: UploadFile = File(...),
+    top_k: Optional[int] = Form(None),
+    min_score: Optional[float] = Form(None),
+):
+    """Like /features/compare, but arrays arrive as raw little-endian bytes or .npy files.
+
+    ``query`` is float32, ``candidates`` is a row-major float32 matrix with the
+    query's dimension and ``candidate_ids`` is int64.
+    """
+    try:
+        q = decode_array(await query.read(), "float32").ravel()
+        matrix = decode_array(await candidates.read(), "float32", dim=q.shape[0])
+        ids = decode_array(await candidate_ids.read(), "int64").ravel()
+        results = top_matches(q, matrix, ids, top_k, min_score)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     return {"results": results}
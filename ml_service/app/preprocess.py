@@ -0,0 +1,45 @@
+"""Decode uploads at roughly the resolution YOLO will actually use.
+
+YOLO letterboxes every image to ``MODEL_INPUT_SIZE`` on its long side, so
+decoding a 12-megapixel phone photo at full size mostly produces pixels that
+are thrown away. JPEGs are decoded in draft mode, which lets libjpeg scale by
+1/2, 1/4 or 1/8 while decoding; other formats are box-reduced right after
+loading. Either way the result stays at least ``MODEL_INPUT_SIZE`` on its long
+side, so the model sees the same detail as before.
+"""
+from typing import BinaryIO
+
+from PIL import Image, ImageOps
+
+from .model import MODEL_INPUT_SIZE
+
+
+class InvalidImage(ValueError):
+    """The upload is not an image PIL can decode, or is truncated."""
+
+
+def load_image(file: BinaryIO) -> Image.Image:
+    """Open an upload as an upright RGB image no larger than needed; raises InvalidImage."""
+    try:
+        return _load_image(file)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        # UnidentifiedImageError and truncated data are OSErrors; some plugins raise SyntaxError
+        raise InvalidImage(f"Cannot decode image: {e}") from e
+
+
+def _load_image(file: BinaryIO) -> Image.Image:
+    img = Image.open(file)
+    if img.format == "JPEG":
+        # Picks the largest reduction that keeps both sides >= the requested size
+        img.draft("RGB", (MODEL_INPUT_SIZE, MODEL_INPUT_SIZE))
+    if img.mode != "RGB":
+        # Before reducing: averaging palette indices would scramble colours
+        img = img.convert("RGB")
+    factor = max(img.size) // MODEL_INPUT_SIZE
+    if factor >= 2:
+        img = img.reduce(factor)
+    # Phone photos are usually stored sideways with an orientation tag; do it on the small image
+    ImageOps.exif_transpose(img, in_place=True)
+    # Decode now, on this thread, so a truncated file fails here rather than in the model
+    img.load()
+    return img
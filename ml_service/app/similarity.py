@@ -0,0 +1,57 @@
+"""Top-k similarity search and binary array decoding for /features/compare.
+
+The backend no longer calls these endpoints: it scores matches against its
+own memory-mapped feature store. They remain for other clients of the
+service and follow the same scoring rules.
+"""
+import io
+from typing import List, Optional
+
+import numpy as np
+
+NPY_MAGIC = b"\x93NUMPY"
+
+
+def decode_array(data: bytes, dtype: str, dim: Optional[int] = None) -> np.ndarray:
+    """Decode a ``.npy`` file or raw little-endian values; raw data is reshaped to ``(-1, dim)``."""
+    if data.startswith(NPY_MAGIC):
+        return np.load(io.BytesIO(data), allow_pickle=False).astype(dtype, copy=False)
+    values = np.frombuffer(data, dtype=np.dtype(dtype).newbyteorder("<"))
+    if dim is None:
+        return values
+    if dim <= 0 or values.size % dim:
+        raise ValueError(f"{values.size} values do not form rows of dim {dim}")
+    return values.reshape(-1, dim)
+
+
+def top_matches(
+    query: np.ndarray,
+    candidates: np.ndarray,
+    candidate_ids: np.ndarray,
+    top_k: Optional[int] = None,
+    min_score: Optional[float] = None,
+) -> List[dict]:
+    """Best candidates by dot product (cosine for normalized vectors), highest first.
+
+    Same rules as the backend's ``FeatureStore.search``: a candidate must
+    score strictly above ``min_score``, and equal scores are ordered by item
+    id. A partition finds the ``top_k``-th best score, so only the
+    candidates at or above it are sorted.
+    """
+    if candidates.ndim != 2 or candidates.shape[1] != query.shape[0]:
+        raise ValueError(f"Candidates of shape {candidates.shape} do not match query of dim {query.shape[0]}")
+    if len(candidate_ids) != candidates.shape[0]:
+        raise ValueError(f"Got {len(candidate_ids)} ids for {candidates.shape[0]} candidates")
+
+    scores = candidates @ query
+    ids = np.asarray(candidate_ids, dtype=np.int64)
+    keep = np.arange(scores.shape[0]) if min_score is None else np.flatnonzero(scores > min_score)
+    if top_k is not None and keep.size > top_k:
+        if top_k <= 0:
+            return []
+        kth = -np.partition(-scores[keep], top_k - 1)[top_k - 1]
+        keep = keep[scores[keep] >= kth]
+    order = keep[np.lexsort((ids[keep], -scores[keep]))]
+    if top_k is not None:
+        order = order[:top_k]
+    return [{"item_id": int(ids[i]), "score": float(scores[i])} for i in order]
@@ -22,15 +22,25 @@ CREATE TABLE items (
   status        ENUM('open', 'matched', 'closed') DEFAULT 'open',
   created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   updated_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-  FOREIGN KEY (user_id) REFERENCES users(id)
+  matches_updated_at TIMESTAMP NULL,
+  FOREIGN KEY (user_id) REFERENCES users(id),
+  INDEX ix_items_created_at_id (created_at, id),
+  INDEX ix_items_type_status_category_created_at (type, status, category, created_at),
+  INDEX ix_items_type_status_location (type, status, location),
+  FULLTEXT INDEX ft_items_text (title, description, category)
 );
 
 CREATE TABLE item_images (
   id          BIGINT AUTO_INCREMENT PRIMARY KEY,
   item_id     BIGINT NOT NULL,
   image_url   VARCHAR(512) NOT NULL,
+  content_hash CHAR(64),
+  thumbnail_url VARCHAR(512),
+  medium_url  VARCHAR(512),
+  feature_status ENUM('pending', 'done', 'failed') NOT NULL DEFAULT 'pending',
   created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-  FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE
+  FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE,
+  INDEX ix_item_images_content_hash (content_hash)
 );
 
 CREATE TABLE image_features (
@@ -42,3 +52,38 @@ CREATE TABLE image_features (
   created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   FOREIGN KEY (image_id) REFERENCES item_images(id) ON DELETE CASCADE
 );
+
+CREATE TABLE feature_cache (
+  id           BIGINT AUTO_INCREMENT PRIMARY KEY,
+  content_hash CHAR(64) NOT NULL,
+  model_name   VARCHAR(100) NOT NULL,
+  feature_dim  INT NOT NULL,
+  feature_vec  BLOB NOT NULL,
+  created_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  UNIQUE KEY uq_feature_cache_hash_model (content_hash, model_name)
+);
+
+CREATE TABLE item_matches (
+  lost_item_id  BIGINT NOT NULL,
+  found_item_id BIGINT NOT NULL,
+  score         FLOAT NOT NULL,
+  created_at    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (lost_item_id, found_item_id),
+  FOREIGN KEY (lost_item_id) REFERENCES items(id) ON DELETE CASCADE,
+  FOREIGN KEY (found_item_id) REFERENCES items(id) ON DELETE CASCADE,
+  INDEX ix_item_matches_lost_score (lost_item_id, score),
+  INDEX ix_item_matches_found_item_id (found_item_id)
+);
+
+CREATE TABLE feature_jobs (
+  id          BIGINT AUTO_INCREMENT PRIMARY KEY,
+  image_id    BIGINT NOT NULL,
+  status      ENUM('pending', 'running', 'done', 'failed') NOT NULL DEFAULT 'pending',
+  attempts    INT NOT NULL DEFAULT 0,
+  last_error  TEXT,
+  run_after   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  updated_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  FOREIGN KEY (image_id) REFERENCES item_images(id) ON DELETE CASCADE,
+  INDEX ix_feature_jobs_status_run_after (status, run_after)
+);